@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import json
+import logging
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 
 from .const import (
     DOMAIN,
@@ -13,10 +15,19 @@ from .const import (
     CONF_CODE,
     CONF_POLLING_MINUTES,
     CONF_ENTITY_TYPES_JSON,
+    CONF_PUSH_UPDATES,
+    CONF_TRACE,
     DEFAULT_POLLING_MINUTES,
+    PRIORITY_BACKGROUND,
+    SIGNAL_DEVICE_RENAMED,
 )
 from .coordinator import ZenseCoordinator, ZenseDevice
 from .api import ZenseClient
+from .registry import async_get_client, async_release_client
+from .services import async_setup_services, async_unload_services
+from .store import ZenseDeviceCache, ZenseLevelSnapshot
+
+_LOGGER = logging.getLogger(__name__)
 
 
 def _parse_entity_map(entry: ConfigEntry) -> dict[int, str]:
@@ -41,6 +52,45 @@ def _parse_entity_map(entry: ConfigEntry) -> dict[int, str]:
         return {}
 
 
+async def _async_revalidate_devices(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    client: ZenseClient,
+    coordinator: ZenseCoordinator,
+    cache: ZenseDeviceCache,
+    cached: dict[int, str],
+) -> None:
+    owner = entry.entry_id
+    ids = await client.get_devices(priority=PRIORITY_BACKGROUND, owner=owner)
+    if not ids:
+        return
+
+    if set(ids) != set(cached):
+        # nye eller fjernede enheder: hent kun navne for de nye og genindlæs
+        fresh = {did: cached[did] for did in ids if did in cached}
+        for did in ids:
+            if did not in fresh:
+                fresh[did] = await client.get_name(did, priority=PRIORITY_BACKGROUND, owner=owner)
+        await cache.async_save(fresh)
+        _LOGGER.info("Zense device list changed, reloading %s", entry.title)
+        hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+        return
+
+    names = dict(cached)
+    for did in ids:
+        nm = await client.get_name(did, priority=PRIORITY_BACKGROUND, owner=owner)
+        if nm == f"Device_{did}" or nm == names.get(did):
+            continue
+        names[did] = nm
+        coordinator.devices = [
+            ZenseDevice(did=d.did, name=nm) if d.did == did else d for d in coordinator.devices
+        ]
+        async_dispatcher_send(hass, SIGNAL_DEVICE_RENAMED.format(entry.entry_id), did, nm)
+
+    if names != cached:
+        await cache.async_save(names)
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     host = entry.data[CONF_HOST]
     port = entry.data[CONF_PORT]
@@ -49,12 +99,41 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     polling_minutes = int(entry.options.get(CONF_POLLING_MINUTES, DEFAULT_POLLING_MINUTES))
     polling_seconds = max(30, polling_minutes * 60)
 
-    client = ZenseClient(host, port, code)
-    devices_map = await client.async_get_devices_and_names(hass)
+    # entries der peger på samme boks deler forbindelse og rate limiter
+    client = async_get_client(hass, host, port, code, entry.entry_id)
+    if entry.options.get(CONF_TRACE, False):
+        # rå protokol-trace til fejlsøgning; kan afspilles med tools/replay.py
+        name = f"{DOMAIN}_trace_{host}_{port}.log".replace(":", "_")
+        client.async_start_trace(hass.config.path(name))
+    cache = ZenseDeviceCache(hass, entry.entry_id, host, port)
+    cached = await cache.async_load()
+    if cached is None:
+        devices_map = await client.async_get_devices_and_names(hass)
+        if devices_map:
+            await cache.async_save(devices_map)
+    else:
+        devices_map = cached
     devices = [ZenseDevice(did=k, name=v) for k, v in sorted(devices_map.items())]
 
-    coordinator = ZenseCoordinator(hass, client, devices, polling_seconds)
-    await coordinator.async_config_entry_first_refresh()
+    snapshot = ZenseLevelSnapshot(hass, entry.entry_id)
+    levels = await snapshot.async_load() if cached is not None else None
+    coordinator = ZenseCoordinator(hass, client, devices, polling_seconds, snapshot)
+    if levels is None:
+        # intet at vise endnu: vent på første sweep som før
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await coordinator.async_shutdown()
+            await async_release_client(hass, client, entry.entry_id)
+            raise
+    else:
+        # entiteter oprettes straks med sidst kendte niveauer; sweep kører bagefter
+        coordinator.async_restore(levels)
+
+    if devices:
+        client.async_start_keepalive(entry.entry_id, devices[0].did)
+    if entry.options.get(CONF_PUSH_UPDATES, False):
+        entry.async_on_unload(client.async_start_listener(coordinator.async_handle_push))
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
@@ -64,12 +143,35 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "entity_map": _parse_entity_map(entry),
     }
 
+    async_setup_services(hass)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    if levels is not None:
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_first_refresh"
+        )
+    if cached is not None:
+        entry.async_create_background_task(
+            hass,
+            _async_revalidate_devices(hass, entry, client, coordinator, cache, cached),
+            f"{DOMAIN}_revalidate_devices",
+        )
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if ok and DOMAIN in hass.data:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        data = hass.data[DOMAIN].pop(entry.entry_id, None)
+        if data:
+            await data["coordinator"].async_shutdown()
+            await async_release_client(hass, data["client"], entry.entry_id)
+        if not hass.data[DOMAIN]:
+            async_unload_services(hass)
     return ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    cache = ZenseDeviceCache(hass, entry.entry_id, entry.data[CONF_HOST], entry.data[CONF_PORT])
+    await cache.async_remove()
+    await ZenseLevelSnapshot(hass, entry.entry_id).async_remove()
@@ -2,12 +2,35 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import socket
 import time
-from typing import Optional
+import weakref
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
 
 from homeassistant.core import HomeAssistant
 
-from .const import BRIGHTNESS_SCALE, DEFAULT_CMD_GAP_S
+from .breaker import ALLOW_DENIED, ALLOW_PROBE, STATE_OPEN, CircuitBreaker
+from .const import (
+    BRIGHTNESS_SCALE,
+    DEFAULT_CMD_DEADLINE_S,
+    DEFAULT_HANDOFF_S,
+    DEFAULT_KEEPALIVE_S,
+    DEFAULT_MAX_INFLIGHT,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+)
+from .limiter import AdaptiveRateLimiter
+from .protocol import VERB_LOGIN, FrameParser, Reply, Request, decode_reply
+from .ramp import RampScheduler
+from .telemetry import ClientTelemetry
+from .trace import TRACE_EVENT, TRACE_RECEIVED, TRACE_SENT, TraceRecorder
+
+PushCallback = Callable[[int, int], None]
+
+
+class QueueTimeout(TimeoutError):
+    """Deadline udløb før kommandoen nåede ud på linjen (lokal overbelastning)."""
 
 
 class ZenseClient:
@@ -18,197 +41,731 @@ class ZenseClient:
 
         self.logger = logging.getLogger(__name__)
 
-        self._lock = asyncio.Lock()
+        # Kommando-motor: én writer-task, prioriteret kø af futures, begrænset in-flight
+        # (prioritet, (tag, sekvens), request, future, deadline, sat i kø)
+        self._queue: asyncio.PriorityQueue[
+            tuple[int, tuple[float, int], Request, asyncio.Future, float, float]
+        ] = asyncio.PriorityQueue()
+        self._seq = 0
+        # Fair kø mellem ejere (config entries) for baggrundsarbejde: hver ejer
+        # får sit eget virtuelle ur (start-time fair queuing)
+        self._vclock = 0.0
+        self._owner_tags: dict[Optional[str], float] = {}
+        self.owners: set[str] = set()
+        self._interactive_inflight = 0
+        self._wake = asyncio.Event()
+        # (request, future, afsendt, deadline-timer)
+        self._inflight: deque[
+            tuple[Request, asyncio.Future, float, asyncio.TimerHandle]
+        ] = deque()
+        self._sent: weakref.WeakSet[asyncio.Future] = weakref.WeakSet()
+        self._inflight_changed = asyncio.Event()
+        self._slots = asyncio.Semaphore(DEFAULT_MAX_INFLIGHT)
+        self._writer_task: Optional[asyncio.Task] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        # lukning startet fra _expire (en timer-callback kan ikke vente på den)
+        self._close_task: Optional[asyncio.Task] = None
+        self._session_lock = asyncio.Lock()
+
+        # Push-lytter: holder forbindelsen åben og sender statusændringer videre
+        self._push_cbs: list[PushCallback] = []
+        self._listener_task: Optional[asyncio.Task] = None
+
+        # Keepalive: prober en tavs forbindelse og logger ind igen før brugeren skal bruge den
+        self._keepalive_task: Optional[asyncio.Task] = None
+        # probe-enhed pr. ejer; loopet kører så længe mindst én ejer har en
+        self._keepalive_probes: dict[str, int] = {}
+        self._last_activity = 0.0
 
         self._reader: Optional[asyncio.StreamReader] = None
         self._writer: Optional[asyncio.StreamWriter] = None
+        self._parser = FrameParser()
         self._logged_in = False
+        self._connected_once = False
+
+        self.limiter = AdaptiveRateLimiter()
+        self.breaker = CircuitBreaker(on_change=self._breaker_changed)
+        self._availability_cbs: list[Callable[[bool], None]] = []
+        self._was_available = True
+
+        # Skrive-coalescer pr. enhed (se _write)
+        self._write_busy: set[int] = set()
+        self._write_pending: dict[int, tuple[Request, asyncio.Future]] = {}
 
-        self._last_tx = 0.0
-        self._cmd_gap_s = float(DEFAULT_CMD_GAP_S)
+        # Overgange (transition) som Fade-trin afstemt efter linkets rate
+        self.ramps = RampScheduler(self._ramp_step, lambda: self.limiter.rate)
 
-        self._bucket_capacity = 3.0
-        self._bucket_tokens = self._bucket_capacity
-        self._bucket_refill_per_sec = 2.5
-        self._bucket_last = time.monotonic()
+        # enhedslisten fra async_test_connection (tidspunkt, ids); bruges én gang
+        self._tested_ids: Optional[tuple[float, list[int]]] = None
 
         self._timeout_s = 12.0
 
+        self.telemetry = ClientTelemetry()
+        self.trace: Optional[TraceRecorder] = None
+
+    def _pop_inflight(self) -> tuple[Request, asyncio.Future, float]:
+        # kommandoen forlader linjen: timeren stoppes og in-flight-pladsen frigives
+        req, fut, sent, handle = self._inflight.popleft()
+        handle.cancel()
+        self._slots.release()
+        return req, fut, sent
+
+    def _fail_inflight(self, err: Exception) -> None:
+        self._inflight_changed.set()
+        while self._inflight:
+            _, fut, _ = self._pop_inflight()
+            if not fut.done():
+                fut.set_exception(err)
+
     async def _close(self) -> None:
-        try:
-            if self._writer is not None:
-                self._writer.close()
-                try:
-                    await self._writer.wait_closed()
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        task = self._reader_task
+        self._reader_task = None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self._fail_inflight(ConnectionError("connection closed"))
+        # felterne nulstilles før der ventes, så writer-loopet ikke sender ind i
+        # en forbindelse der er ved at lukke (eller nulstiller en ny session)
+        writer = self._writer
         self._reader = None
         self._writer = None
+        self._parser.reset()
         self._logged_in = False
+        if writer is None:
+            return
+        if self.trace is not None:
+            self.trace.record(TRACE_EVENT, "close")
+        try:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+        except Exception:
+            pass
 
     async def _connect(self) -> None:
         await self._close()
+        if self._connected_once:
+            self.telemetry.incr("reconnects")
+        self._connected_once = True
+        if self.trace is not None:
+            self.trace.record(TRACE_EVENT, "connect")
         self._reader, self._writer = await asyncio.wait_for(
             asyncio.open_connection(self.host, self.port),
             timeout=self._timeout_s,
         )
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            except OSError:
+                pass
         self._logged_in = False
 
-    async def _bucket_wait(self) -> None:
-        now = time.monotonic()
-        dt = now - self._bucket_last
-        self._bucket_last = now
-        self._bucket_tokens = min(
-            self._bucket_capacity,
-            self._bucket_tokens + dt * self._bucket_refill_per_sec,
+    async def _rate_limit(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        # baggrundstrafik efterlader ét token, så en brugerkommando kan sendes straks
+        waited = await self.limiter.acquire(
+            reserve=0.0 if priority == PRIORITY_INTERACTIVE else 1.0
         )
-        if self._bucket_tokens < 1.0:
-            need = 1.0 - self._bucket_tokens
-            wait = need / self._bucket_refill_per_sec
-            await asyncio.sleep(max(0.0, wait))
-            now2 = time.monotonic()
-            dt2 = now2 - self._bucket_last
-            self._bucket_last = now2
-            self._bucket_tokens = min(
-                self._bucket_capacity,
-                self._bucket_tokens + dt2 * self._bucket_refill_per_sec,
-            )
-        self._bucket_tokens -= 1.0
-
-    async def _rate_limit(self) -> None:
-        await self._bucket_wait()
-        now = time.monotonic()
-        wait = self._cmd_gap_s - (now - self._last_tx)
-        if wait > 0:
-            await asyncio.sleep(wait)
-        self._last_tx = time.monotonic()
-
-    async def _recv_frame(self) -> str:
+        self.telemetry.note_limiter_wait(waited)
+
+    async def _recv_frame(self, timeout: Optional[float] = -1.0) -> str:
         if self._reader is None:
             return ""
-        buf = ""
-        end_time = time.monotonic() + self._timeout_s
-        while time.monotonic() < end_time:
-            chunk = await asyncio.wait_for(self._reader.read(1024), timeout=self._timeout_s)
+        if timeout is not None and timeout < 0:
+            timeout = self._timeout_s
+        parser = self._parser
+        end_time = time.monotonic() + (timeout if timeout is not None else float("inf"))
+        while not len(parser):
+            remaining = None if timeout is None else end_time - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return ""
+            chunk = await asyncio.wait_for(self._reader.read(4096), timeout=remaining)
             if not chunk:
-                break
-            buf += chunk.decode(errors="replace")
-            if "<<" in buf:
-                idx = buf.find("<<")
-                return buf[: idx + 2]
-        return buf
+                if self.trace is not None:
+                    self.trace.record(TRACE_EVENT, "eof")
+                return ""
+            parser.feed(chunk)
+        frame = str(parser.pop(), "utf-8", "replace").lstrip()
+        if self.trace is not None:
+            self.trace.record(TRACE_RECEIVED, frame)
+        return frame
 
-    async def _send_raw(self, cmd: str) -> str:
+    async def _send_raw(self, req: Request) -> str:
         if self._writer is None:
             return ""
         await self._rate_limit()
-        self._writer.write(cmd.encode())
+        data = req.encode()
+        if self.trace is not None:
+            # login-koden skrives ikke i trace-filen
+            shown = Request(VERB_LOGIN, arg="****") if req.verb == VERB_LOGIN else req
+            self.trace.record(TRACE_SENT, shown.encode().decode())
+        self._writer.write(data)
         await asyncio.wait_for(self._writer.drain(), timeout=self._timeout_s)
         return await self._recv_frame()
 
     async def _login(self) -> bool:
         if self._reader is None or self._writer is None:
             await self._connect()
-        resp = await self._send_raw(f">>Login {self.code}<<")
-        if ">>Login Ok<<" in resp:
+        reply = decode_reply(await self._send_raw(Request.login(self.code)))
+        if reply.verb == VERB_LOGIN and reply.ok:
+            self.telemetry.incr("logins")
             self._logged_in = True
             await asyncio.sleep(0.2)
             return True
+        self.telemetry.incr("login_failures")
         await self._close()
         return False
 
-    async def send_command(self, cmd: str, retry: int = 2) -> str:
-        async with self._lock:
-            backoff = 0.25
-            for attempt in range(retry + 1):
-                try:
-                    if self._reader is None or self._writer is None or not self._logged_in:
-                        ok = await self._login()
-                        if not ok:
-                            if attempt < retry:
-                                await asyncio.sleep(backoff)
-                                backoff = min(2.0, backoff * 1.7)
-                                continue
-                            return ""
-
-                    resp = await self._send_raw(cmd)
-                    if not resp or "Timeout" in resp:
-                        raise TimeoutError
-
-                    return resp
-                except Exception:
-                    await self._close()
-                    if attempt < retry:
-                        await asyncio.sleep(backoff)
-                        backoff = min(2.0, backoff * 1.7)
-                        continue
-                    return ""
-        return ""
-
-    async def get_devices(self) -> list[int]:
-        resp = await self.send_command(">>Get Devices<<")
-        if ">>Get Devices " in resp:
-            part = resp.split(">>Get Devices ", 1)[1].split("<<", 1)[0]
-            out: list[int] = []
-            for x in part.split(","):
-                x = x.strip()
-                if x.isdigit():
-                    out.append(int(x))
-            return out
-        return []
-
-    async def get_name(self, did: int) -> str:
-        for _ in range(3):
-            resp = await self.send_command(f">>Get Name {did}<<")
-            if ">>Get Name " in resp:
-                nm = resp.split(">>Get Name ", 1)[1].split("<<", 1)[0].strip().strip("'")
-                if nm and nm.lower() != "timeout":
-                    return nm
-            await asyncio.sleep(0.15)
-        return f"Device_{did}"
+    def _ensure_engine(self) -> None:
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    def _expire(self, fut: asyncio.Future) -> None:
+        # også selvom kalderen har givet op: svaret kan stadig komme for sent
+        if not any(f is fut for _, f, _, _ in self._inflight):
+            return
+        # Intet svar inden for timeout: sessionen anses for død
+        self.logger.debug("Zense command timed out, dropping session")
+        self.telemetry.incr("link_timeouts")
+        self.limiter.on_failure()
+        if self._close_task is None or self._close_task.done():
+            self._close_task = asyncio.create_task(self._close())
+
+    async def _writer_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            prio, order, req, fut, deadline, queued = item
+            self.telemetry.note_queue_depth(self._queue.qsize())
+            if fut.done():
+                continue
+            if deadline <= time.monotonic():
+                self.telemetry.incr("queue_timeouts")
+                fut.set_exception(QueueTimeout("deadline exceeded before send"))
+                continue
+            if prio != PRIORITY_INTERACTIVE:
+                # baggrundsarbejde venter på ledig linktid; nye brugerkommandoer går forrest
+                if self._interactive_inflight:
+                    self._wake.clear()
+                    self._queue.put_nowait(item)
+                    await self._wake.wait()
+                    continue
+                if not await self._background_turn():
+                    self._queue.put_nowait(item)
+                    continue
+                if fut.done() or deadline <= time.monotonic():
+                    # udløb mens den ventede på sit token: næste kommando får det
+                    self.limiter.refund()
+                    if not fut.done():
+                        self.telemetry.incr("queue_timeouts")
+                        fut.set_exception(QueueTimeout("deadline exceeded before send"))
+                    continue
+            if prio == PRIORITY_INTERACTIVE:
+                self._interactive_inflight += 1
+                fut.add_done_callback(self._interactive_done)
+            await self._slots.acquire()
+            # pladsen holdes til kommandoen er ude af _inflight igen (_pop_inflight),
+            # også hvis kalderen giver op før svaret kommer
+            on_link = False
+            try:
+                if fut.done():
+                    continue
+                if not await self._ensure_session():
+                    if not fut.done():
+                        fut.set_result(None)
+                    continue
+
+                # svar på samme verbum kan ikke altid skelnes (">>Get 80<<" har
+                # intet device-id), så de sendes aldrig samtidig
+                while any(r.verb == req.verb for r, *_ in self._inflight):
+                    self._inflight_changed.clear()
+                    await self._inflight_changed.wait()
+
+                if prio == PRIORITY_INTERACTIVE:
+                    await self._rate_limit(prio)
+                if fut.done() or self._writer is None:
+                    if not fut.done():
+                        fut.set_exception(ConnectionError("connection closed"))
+                    continue
+                if deadline <= time.monotonic():
+                    if prio == PRIORITY_INTERACTIVE:
+                        self.limiter.refund()
+                    self.telemetry.incr("queue_timeouts")
+                    fut.set_exception(QueueTimeout("deadline exceeded before send"))
+                    continue
+                # linkens egen timeout; kalderens deadline håndteres i _submit
+                handle = loop.call_later(self._timeout_s, self._expire, fut)
+                now = time.monotonic()
+                self._inflight.append((req, fut, now, handle))
+                on_link = True
+                self._sent.add(fut)
+                data = req.encode()
+                if self.trace is not None:
+                    self.trace.record(TRACE_SENT, data.decode())
+                self._writer.write(data)
+                self.telemetry.incr("commands_sent")
+                self.telemetry.queue_wait.observe(now - queued)
+                if prio != PRIORITY_INTERACTIVE:
+                    self._vclock = max(self._vclock, order[0])
+                await asyncio.wait_for(self._writer.drain(), timeout=self._timeout_s)
+            except asyncio.CancelledError:
+                if not fut.done():
+                    fut.cancel()
+                raise
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                await self._close()
+            finally:
+                if not on_link:
+                    self._slots.release()
+
+    async def _background_turn(self) -> bool:
+        # True når baggrundskommandoen har fået sit token; False hvis en
+        # brugerkommando kom til imens (ventetiden er da ikke brugt)
+        self._wake.clear()
+        acquire = asyncio.ensure_future(self._rate_limit(PRIORITY_BACKGROUND))
+        wake = asyncio.ensure_future(self._wake.wait())
+        try:
+            done, _ = await asyncio.wait({acquire, wake}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            wake.cancel()
+            if not acquire.done():
+                acquire.cancel()
+        return acquire in done
+
+    def _interactive_done(self, _fut: asyncio.Future) -> None:
+        self._interactive_inflight -= 1
+        self._wake.set()
+
+    async def _reader_loop(self) -> None:
+        try:
+            while self._reader is not None:
+                # Ingen timeout her; deadlines håndhæves pr. kommando i _expire
+                frame = await self._recv_frame(timeout=None)
+                self._last_activity = time.monotonic()
+                if not frame:
+                    if self._inflight:
+                        self.limiter.on_failure()
+                    break
+                reply = decode_reply(frame)
+                if reply.is_push:
+                    self.telemetry.incr("push_frames")
+                    self._dispatch_push(reply.did, max(0, min(BRIGHTNESS_SCALE, reply.level)))
+                self._resolve(reply)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.logger.debug("Zense reader failed, dropping session", exc_info=True)
+        if self._reader_task is asyncio.current_task():
+            await self._close()
+
+    def _resolve(self, reply: Reply) -> None:
+        # Par svaret med den ældste kommando det passer til (verbum og evt.
+        # device-id). Ældre kommandoer foran den har mistet deres svar; et svar
+        # der ikke passer til noget er forsinket eller uopfordret og droppes.
+        idx = next(
+            (i for i, (req, *_) in enumerate(self._inflight) if reply.matches(req)),
+            None,
+        )
+        self._inflight_changed.set()
+        if idx is None:
+            if not reply.is_push:
+                self.telemetry.incr("stale_frames")
+                self.logger.debug("Discarding stale Zense frame %r", reply.raw)
+            return
+        for _ in range(idx):
+            _, fut, _ = self._pop_inflight()
+            self.limiter.on_failure()
+            self.telemetry.incr("replies_lost")
+            if not fut.done():
+                fut.set_exception(TimeoutError("reply lost"))
+        _, fut, sent = self._pop_inflight()
+        rtt = time.monotonic() - sent
+        self.telemetry.incr("replies")
+        self.telemetry.rtt.observe(rtt)
+        if reply.timeout:
+            self.telemetry.incr("timeout_replies")
+            self.limiter.on_failure()
+        else:
+            self.limiter.on_success(rtt)
+        if not fut.done():
+            fut.set_result(reply)
+
+    async def _ensure_session(self) -> bool:
+        async with self._session_lock:
+            if self._reader is None or self._writer is None or not self._logged_in:
+                if not await self._login():
+                    return False
+            if self._reader_task is None or self._reader_task.done():
+                self._reader_task = asyncio.create_task(self._reader_loop())
+            return True
+
+    def _dispatch_push(self, did: int, level: int) -> None:
+        # alle entries på samme boks får besked; hver ignorerer ukendte enheder
+        for cb in list(self._push_cbs):
+            try:
+                cb(did, level)
+            except Exception:
+                self.logger.exception("Zense push callback failed")
+
+    async def _listener_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                ok = await self._ensure_session()
+            except Exception:
+                ok = False
+            if ok:
+                backoff = 1.0
+                task = self._reader_task
+                if task is not None:
+                    # vent til forbindelsen dør, og genopret den så
+                    await asyncio.wait({task})
+            else:
+                backoff = min(60.0, backoff * 2)
+            await asyncio.sleep(backoff)
+
+    def async_start_listener(self, callback: PushCallback) -> Callable[[], None]:
+        self._push_cbs.append(callback)
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listener_loop())
+
+        def remove() -> None:
+            if callback in self._push_cbs:
+                self._push_cbs.remove(callback)
+            if not self._push_cbs and self._listener_task is not None:
+                self._listener_task.cancel()
+                self._listener_task = None
 
+        return remove
 
-    async def get_level(self, did: int) -> Optional[int]:
-        resp = await self.send_command(f">>Get {did}<<")
-        if ">>Get " in resp:
+    async def _keepalive_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, interval / 4))
             try:
-                return int(resp.split(">>Get ", 1)[1].split("<<", 1)[0].strip())
+                if self.breaker.state == STATE_OPEN and not self.breaker.probe_due():
+                    # boksen svarer ikke; ingen reconnect-forsøg (og låst session)
+                    # før bryderens cooldown er gået
+                    continue
+                if not self._logged_in:
+                    # sessionen er død: genopret den nu i stedet for ved næste brugerkommando
+                    await self._ensure_session()
+                    continue
+                if time.monotonic() - self._last_activity < interval:
+                    continue
+                if not self._keepalive_probes:
+                    continue
+                # en enhed fra en ejer der stadig bruger klienten
+                owner, did = next(iter(self._keepalive_probes.items()))
+                reply = await self.request(
+                    Request.get_level(did), retry=0, priority=PRIORITY_BACKGROUND, owner=owner
+                )
+                if reply is None:
+                    self.logger.debug("Zense keepalive probe failed, reconnecting")
+                    await self._ensure_session()
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                return None
+                self.logger.debug("Zense keepalive reconnect failed", exc_info=True)
+
+    def async_start_keepalive(
+        self, owner: str, did: int, interval: float = DEFAULT_KEEPALIVE_S
+    ) -> None:
+        self._keepalive_probes[owner] = did
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop(interval))
+
+    def async_stop_keepalive(self, owner: str) -> None:
+        # den sidste ejer med en probe stopper loopet; ellers probes en andens enhed
+        self._keepalive_probes.pop(owner, None)
+        if not self._keepalive_probes and self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+
+    def _order(self, priority: int, owner: Optional[str]) -> tuple[float, int]:
+        self._seq += 1
+        if priority == PRIORITY_INTERACTIVE:
+            return (0.0, self._seq)
+        # en ejer med mange ventende kommandoer rykker sit eget ur frem, så en
+        # anden ejers næste kommando kommer ind imellem i stedet for bagerst
+        tag = max(self._vclock, self._owner_tags.get(owner, 0.0)) + 1.0
+        self._owner_tags[owner] = tag
+        return (tag, self._seq)
+
+    async def _submit(
+        self, req: Request, priority: int, deadline: float, owner: Optional[str] = None
+    ) -> Optional[Reply]:
+        self._ensure_engine()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        order = self._order(priority, owner)
+        self._queue.put_nowait((priority, order, req, fut, deadline, time.monotonic()))
+        self.telemetry.note_queue_depth(self._queue.qsize())
+        if priority == PRIORITY_INTERACTIVE:
+            self._wake.set()
+        try:
+            return await asyncio.wait_for(fut, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError as e:
+            if fut not in self._sent:
+                raise QueueTimeout("deadline exceeded in queue") from e
+            raise
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.available
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and self._logged_in
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    @property
+    def queue_depth(self) -> int:
+        # kommandoer der venter på writeren (ikke dem på linjen)
+        return self._queue.qsize()
+
+    def async_add_availability_listener(self, cb: Callable[[bool], None]) -> Callable[[], None]:
+        self._availability_cbs.append(cb)
+        return lambda: self._availability_cbs.remove(cb)
+
+    def _breaker_changed(self, state: str) -> None:
+        self.logger.info("Zense controller %s:%s circuit %s", self.host, self.port, state)
+        if self.available == self._was_available:
+            return
+        self._was_available = self.available
+        for cb in list(self._availability_cbs):
+            try:
+                cb(self.available)
+            except Exception:
+                self.logger.exception("Zense availability callback failed")
+
+    async def request(
+        self,
+        req: Request,
+        retry: int = 2,
+        priority: int = PRIORITY_INTERACTIVE,
+        budget: float = DEFAULT_CMD_DEADLINE_S,
+        owner: Optional[str] = None,
+    ) -> Optional[Reply]:
+        ticket = self.breaker.allow()
+        if ticket == ALLOW_DENIED:
+            return None
+        # ét samlet budget for alle forsøg; hvert forsøg får det der er tilbage
+        deadline = time.monotonic() + budget
+        backoff = 0.25
+        link_failed = False
+        for attempt in range(retry + 1):
+            try:
+                reply = await self._submit(req, priority, deadline, owner)
+                if reply is None:
+                    raise ConnectionError("no session")
+                if not reply.timeout:
+                    self.breaker.record_success()
+                    return reply
+                # Timeout-svar: boksen svarer, kun enheden gør ikke. Det prøves
+                # igen, men tæller ikke i bryderen (limiteren er allerede slået ned)
+                link_failed = False
+            except asyncio.CancelledError:
+                if ticket == ALLOW_PROBE:
+                    self.breaker.release()
+                raise
+            except QueueTimeout:
+                # boksen har ikke fejlet; vi nåede bare ikke at sende i tide
+                break
+            except Exception:
+                link_failed = True
+            if attempt < retry and deadline - time.monotonic() > backoff:
+                self.telemetry.incr("retries")
+                await asyncio.sleep(backoff)
+                backoff = min(2.0, backoff * 1.7)
+                continue
+            break
+        if link_failed:
+            self.breaker.record_failure()
+        elif ticket == ALLOW_PROBE:
+            # proben nåede ikke boksen; den næste kalder må prøve
+            self.breaker.release()
         return None
 
+    async def send_command(
+        self,
+        cmd: str,
+        retry: int = 2,
+        priority: int = PRIORITY_INTERACTIVE,
+        budget: float = DEFAULT_CMD_DEADLINE_S,
+    ) -> str:
+        reply = await self.request(
+            Request.from_command(cmd), retry=retry, priority=priority, budget=budget
+        )
+        return reply.raw if reply is not None else ""
+
+    async def async_shutdown(self) -> None:
+        self._push_cbs.clear()
+        await self.ramps.async_cancel_all()
+        tasks = [
+            t
+            for t in (self._keepalive_task, self._listener_task, self._writer_task)
+            if t is not None
+        ]
+        self._keepalive_task = None
+        self._listener_task = None
+        self._writer_task = None
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        while not self._queue.empty():
+            _, _, _, fut, _, _ = self._queue.get_nowait()
+            if not fut.done():
+                fut.cancel()
+        close_task, self._close_task = self._close_task, None
+        if close_task is not None:
+            await asyncio.gather(close_task, return_exceptions=True)
+        await self._close()
+        await self.async_stop_trace()
+
+    def async_start_trace(self, path: str) -> None:
+        if self.trace is None:
+            self.trace = TraceRecorder(path, f"{self.host}:{self.port}")
+            self.trace.start()
+
+    async def async_stop_trace(self) -> None:
+        trace, self.trace = self.trace, None
+        if trace is not None:
+            await trace.async_stop()
+
+    async def get_devices(
+        self, priority: int = PRIORITY_INTERACTIVE, owner: Optional[str] = None
+    ) -> list[int]:
+        reply = await self.request(Request.get_devices(), priority=priority, owner=owner)
+        return list(reply.ids) if reply is not None else []
+
+    async def get_name(
+        self, did: int, priority: int = PRIORITY_INTERACTIVE, owner: Optional[str] = None
+    ) -> str:
+        for _ in range(3):
+            reply = await self.request(Request.get_name(did), priority=priority, owner=owner)
+            if reply is not None and reply.name:
+                return reply.name
+            await asyncio.sleep(0.15)
+        return f"Device_{did}"
+
+    async def get_level(
+        self, did: int, priority: int = PRIORITY_INTERACTIVE, owner: Optional[str] = None
+    ) -> Optional[int]:
+        reply = await self.request(Request.get_level(did), priority=priority, owner=owner)
+        return reply.level if reply is not None else None
+
+    async def _write(self, did: int, req: Request, cancel_ramp: bool = True) -> bool:
+        # Samler skrivninger pr. enhed: første sendes straks, mellemliggende
+        # værdier droppes mens en kommando er undervejs, og den sidste sendes altid.
+        # En ny kommando til enheden stopper en kørende overgang
+        if cancel_ramp and self.ramps.active(did):
+            await self.ramps.async_cancel(did)
+        if did in self._write_busy:
+            prev = self._write_pending.pop(did, None)
+            if prev is not None and not prev[1].done():
+                self.telemetry.incr("coalesced_writes")
+                prev[1].set_result(True)
+            fut: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._write_pending[did] = (req, fut)
+            return await fut
+
+        self._write_busy.add(did)
+        try:
+            ok = await self.request(req) is not None
+            while did in self._write_pending:
+                nxt, fut = self._write_pending.pop(did)
+                res = await self.request(nxt) is not None
+                if not fut.done():
+                    fut.set_result(res)
+            return ok
+        finally:
+            self._write_busy.discard(did)
+            left = self._write_pending.pop(did, None)
+            if left is not None and not left[1].done():
+                left[1].set_result(False)
+
     async def set_on(self, did: int) -> bool:
-        return bool(await self.send_command(f">>Set {did} {BRIGHTNESS_SCALE}<<"))
+        return await self._write(did, Request.set_level(did, BRIGHTNESS_SCALE))
 
     async def set_off(self, did: int) -> bool:
-        return bool(await self.send_command(f">>Set {did} 0<<"))
+        return await self._write(did, Request.set_level(did, 0))
 
     async def fade(self, did: int, level: int) -> bool:
-        level = max(0, min(BRIGHTNESS_SCALE, int(level)))
-        return bool(await self.send_command(f">>Fade {did} {level}<<"))
+        return await self._write(did, Request.fade(did, level))
+
+    async def set_level(self, did: int, level: int) -> bool:
+        return await self._write(did, Request.set_level(did, level))
+
+    async def _ramp_step(self, did: int, level: int) -> bool:
+        return await self._write(did, Request.fade(did, level), cancel_ramp=False)
+
+    def start_transition(self, did: int, start: int, target: int, duration: float) -> asyncio.Task:
+        """Overgang fra start til target over duration sekunder.
+
+        Korte overgange (op til boksens egen fade-tid) er én Fade; længere
+        køres som Fade-trin. Tasken giver True hvis sidste trin lykkedes.
+        """
+        start = max(0, min(BRIGHTNESS_SCALE, int(start)))
+        target = max(0, min(BRIGHTNESS_SCALE, int(target)))
+        return self.ramps.start(did, start, target, max(0.0, float(duration)))
+
+    async def async_apply_levels(self, levels: dict[int, int]) -> dict[int, bool]:
+        # alle skrivninger lægges i køen på én gang; motoren og limiteren
+        # bestemmer takten, og _write dropper overhalede værdier pr. enhed
+        async def _one(did: int, level: int) -> bool:
+            level = max(0, min(BRIGHTNESS_SCALE, int(level)))
+            if level in (0, BRIGHTNESS_SCALE):
+                return await self._write(did, Request.set_level(did, level))
+            return await self._write(did, Request.fade(did, level))
+
+        dids = list(levels)
+        res = await asyncio.gather(*(_one(did, levels[did]) for did in dids))
+        return dict(zip(dids, res))
 
     async def async_test_connection(self, hass: HomeAssistant) -> bool:
+        # lukker ikke klienten; den kan være delt (se registry.py)
         try:
-            ok = await self._login()
-            if not ok:
+            if not await self._ensure_session():
                 return False
-            ids = await self.get_devices()
-            return len(ids) > 0
-        finally:
-            await self._close()
+        except (OSError, asyncio.TimeoutError) as e:
+            self.logger.debug("Zense %s:%s connection test failed: %s", self.host, self.port, e)
+            return False
+        ids = await self.get_devices()
+        if ids:
+            # den første opsætning lige efter dialogen behøver ikke spørge igen
+            self._tested_ids = (time.monotonic(), ids)
+        return len(ids) > 0
+
+    def _take_tested_ids(self) -> Optional[list[int]]:
+        tested, self._tested_ids = self._tested_ids, None
+        if tested is None or time.monotonic() - tested[0] > DEFAULT_HANDOFF_S:
+            return None
+        return tested[1]
 
     async def async_get_devices_and_names(self, hass: HomeAssistant) -> dict[int, str]:
-        ids = await self.get_devices()
+        ids = self._take_tested_ids() or await self.get_devices()
         out: dict[int, str] = {}
         for did in ids:
             out[did] = await self.get_name(did)
             await asyncio.sleep(0.05)
         return out
 
+    async def async_iter_levels(
+        self, ids: list[int], owner: Optional[str] = None
+    ) -> AsyncIterator[tuple[int, Optional[int]]]:
+        for did in ids:
+            yield did, await self.get_level(did, priority=PRIORITY_BACKGROUND, owner=owner)
+
     async def async_get_levels(self, hass: HomeAssistant, ids: list[int]) -> dict[int, Optional[int]]:
         out: dict[int, Optional[int]] = {}
-        for did in ids:
-            out[did] = await self.get_level(did)
+        async for did, lvl in self.async_iter_levels(ids):
+            out[did] = lvl
         return out
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+from .const import DEFAULT_BREAKER_COOLDOWN_S, DEFAULT_BREAKER_THRESHOLD
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# svar fra allow(): afvist, almindeligt kald eller half-open-proben
+ALLOW_DENIED = 0
+ALLOW_PASS = 1
+ALLOW_PROBE = 2
+
+
+class CircuitBreaker:
+    """Fail-fast når boksen ikke svarer.
+
+    Efter threshold fejlede kommandoer i træk åbnes bryderen, og kald afvises
+    straks. Når cooldown er gået, slippes én probe igennem (half-open); lykkes
+    den lukkes bryderen, ellers åbnes den igen med dobbelt cooldown.
+    """
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        cooldown: float = DEFAULT_BREAKER_COOLDOWN_S,
+        max_cooldown: float = 300.0,
+        on_change: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.threshold = int(threshold)
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.on_change = on_change
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._cooldown = self.base_cooldown
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_change is not None:
+            self.on_change(state)
+
+    def probe_due(self) -> bool:
+        return (
+            self.state == STATE_OPEN
+            and time.monotonic() - self._opened_at >= self._cooldown
+        )
+
+    def allow(self) -> int:
+        if self.state == STATE_CLOSED:
+            return ALLOW_PASS
+        if self.state == STATE_OPEN and self.probe_due():
+            self._set_state(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN and not self._probing:
+            self._probing = True
+            return ALLOW_PROBE
+        return ALLOW_DENIED
+
+    def release(self) -> None:
+        # en afbrudt probe tæller hverken som succes eller fejl; kun kalderen
+        # der fik ALLOW_PROBE må give den tilbage
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self._cooldown = self.base_cooldown
+        self._set_state(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN:
+            self._probing = False
+            self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+            self._trip()
+        elif self.state == STATE_CLOSED and self.failures >= self.threshold:
+            self._trip()
+
+    def _trip(self) -> None:
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._set_state(STATE_OPEN)
+
+    @property
+    def available(self) -> bool:
+        return self.state != STATE_OPEN
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "cooldown_s": self._cooldown,
+            "open_for_s": round(time.monotonic() - self._opened_at, 1)
+            if self.state != STATE_CLOSED
+            else None,
+        }
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import json
+from typing import Optional
+
 import voluptuous as vol
 
 from homeassistant import config_entries
@@ -10,37 +13,118 @@ from homeassistant.data_entry_flow import FlowResult
 from .const import (
     DOMAIN,
     CONF_CODE,
+    DEFAULT_HANDOFF_S,
     DEFAULT_PORT,
     CONF_POLLING_MINUTES,
     CONF_ENTITY_TYPES_JSON,
+    CONF_PUSH_UPDATES,
+    CONF_TRACE,
     DEFAULT_POLLING_MINUTES,
 )
-from .api import ZenseClient
+from .discovery import async_discover_controllers
+from .registry import async_get_client, async_peek_client, async_release_client
+
+MANUAL = "manual"
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self) -> None:
+        self._discovered: list[str] = []
+        self._discover_task: Optional[asyncio.Task] = None
+
+    async def _async_try_create(
+        self, host: str, port: int, code: int, errors: dict[str, str]
+    ) -> Optional[FlowResult]:
+        shared = async_peek_client(self.hass, host, port)
+        if shared is not None and shared.code != int(code):
+            # boksen har kun én login-kode, og den delte session er logget ind
+            # med en anden; testen over den ville ikke sige noget om denne kode
+            errors["base"] = "invalid_auth"
+            return None
+        # en boks der allerede er sat op testes over dens eksisterende session
+        client = async_get_client(self.hass, host, port, code, self.flow_id)
+        ok = False
+        try:
+            ok = await client.async_test_connection(self.hass)
+        finally:
+            # en vellykket session holdes varm til den første opsætning
+            await async_release_client(
+                self.hass, client, self.flow_id, linger=DEFAULT_HANDOFF_S if ok else 0.0
+            )
+        if not ok:
+            errors["base"] = "cannot_connect"
+            return None
+        await self.async_set_unique_id(f"{DOMAIN}_{host}_{port}_{code}")
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(
+            title=f"ZenseHome ({host})",
+            data={CONF_HOST: host, CONF_PORT: port, CONF_CODE: code},
+        )
+
     async def async_step_user(self, user_input=None) -> FlowResult:
+        # skanningen sender en Zense-kommando til hver adresse på port 10001, som
+        # også bruges af andet udstyr (fx seriel-til-TCP-bokse); den kører kun
+        # når brugeren vælger den
+        return self.async_show_menu(step_id="user", menu_options=["discover", MANUAL])
+
+    async def async_step_discover(self, user_input=None) -> FlowResult:
+        # skanningen kører som en task, så brugeren ser en fremdriftsbesked
+        # i stedet for en tom dialog
+        if self._discover_task is None:
+            self._discover_task = self.hass.async_create_task(
+                async_discover_controllers(self.hass)
+            )
+        if not self._discover_task.done():
+            return self.async_show_progress(
+                progress_action="discover", progress_task=self._discover_task
+            )
+        try:
+            found = self._discover_task.result()
+        except Exception:
+            found = []
+        # bokse der allerede er sat op udelades
+        configured = {e.data.get(CONF_HOST) for e in self._async_current_entries()}
+        self._discovered = [h for h in found if h not in configured]
+        return self.async_show_progress_done(
+            next_step_id="select" if self._discovered else "manual"
+        )
+
+    async def async_step_select(self, user_input=None) -> FlowResult:
         errors = {}
 
         if user_input is not None:
-            host = user_input[CONF_HOST]
-            port = user_input[CONF_PORT]
-            code = user_input[CONF_CODE]
+            if user_input[CONF_HOST] == MANUAL:
+                return await self.async_step_manual()
+            if user_input.get(CONF_CODE) is None:
+                errors[CONF_CODE] = "code_required"
+            else:
+                result = await self._async_try_create(
+                    user_input[CONF_HOST], DEFAULT_PORT, user_input[CONF_CODE], errors
+                )
+                if result is not None:
+                    return result
 
-            client = ZenseClient(host, port, code)
-            ok = await client.async_test_connection(self.hass)
+        hosts = {h: h for h in self._discovered}
+        hosts[MANUAL] = "Indtast IP/host manuelt"
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_HOST, default=self._discovered[0]): vol.In(hosts),
+                vol.Optional(CONF_CODE): int,
+            }
+        )
+        return self.async_show_form(step_id="select", data_schema=schema, errors=errors)
 
-            if ok:
-                await self.async_set_unique_id(f"{DOMAIN}_{host}_{port}_{code}")
-                self._abort_if_unique_id_configured()
-                return self.async_create_entry(
-                    title=f"ZenseHome ({host})",
-                    data=user_input,
-                )
+    async def async_step_manual(self, user_input=None) -> FlowResult:
+        errors = {}
 
-            errors["base"] = "cannot_connect"
+        if user_input is not None:
+            result = await self._async_try_create(
+                user_input[CONF_HOST], user_input[CONF_PORT], user_input[CONF_CODE], errors
+            )
+            if result is not None:
+                return result
 
         schema = vol.Schema(
             {
@@ -49,7 +133,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Required(CONF_CODE): int,
             }
         )
-        return self.async_show_form(step_id="user", data_schema=schema, errors=errors)
+        return self.async_show_form(step_id="manual", data_schema=schema, errors=errors)
 
     @staticmethod
     def async_get_options_flow(config_entry):
@@ -97,6 +181,10 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             {
                 vol.Required(CONF_POLLING_MINUTES, default=poll_default): vol.Coerce(int),
                 vol.Optional(CONF_ENTITY_TYPES_JSON, default=ent_default): str,
+                vol.Optional(
+                    CONF_PUSH_UPDATES, default=bool(cur.get(CONF_PUSH_UPDATES, False))
+                ): bool,
+                vol.Optional(CONF_TRACE, default=bool(cur.get(CONF_TRACE, False))): bool,
             }
         )
         return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
\ No newline at end of file
@@ -7,17 +7,81 @@ CONF_CODE = "code"
 # Options
 CONF_POLLING_MINUTES = "polling_minutes"
 CONF_ENTITY_TYPES_JSON = "entity_types_json"
+CONF_PUSH_UPDATES = "push_updates"
+CONF_TRACE = "trace"
 
 DEFAULT_PORT = 10001
 
 # Interne defaults
 DEFAULT_POLLING_MINUTES = 10
-DEFAULT_CMD_GAP_S = 0.2          # lidt højere end 0.10 for mindre pres
-DEFAULT_DEBOUNCE_S = 0.5        # øget fra 0.2
+# Adaptiv rate (kommandoer/sek); starter som den gamle faste bucket
+DEFAULT_RATE_INITIAL = 2.5
+DEFAULT_RATE_MIN = 0.5
+DEFAULT_RATE_MAX = 10.0
+DEFAULT_RATE_BURST = 3.0
+DEFAULT_MAX_INFLIGHT = 2        # kommandoer sendt før svar er modtaget
+
+# Adaptiv polling: rundeinterval, korteste budget pr. enhed, fordoblingstid
+# uden ændringer og hvor stor en andel af linkets rate polling må bruge
+DEFAULT_POLL_TICK_S = 30
+DEFAULT_POLL_MIN_S = 60
+DEFAULT_POLL_HALF_LIFE_S = 900
+DEFAULT_POLL_LINK_SHARE = 0.25
+
+# Samlet tidsbudget for en kommando inkl. genforsøg, og circuit breaker
+DEFAULT_CMD_DEADLINE_S = 15.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN_S = 30.0
+
+# Sekunders stilhed før forbindelsen probes
+DEFAULT_KEEPALIVE_S = 60
+
+# Kontrol-læsning efter en skrivning: første forsinkelse (fordobles pr. forsøg)
+# og antal ekstra læsninger hvis niveauet ikke passer (fx fordi en fade kører)
+DEFAULT_VERIFY_DELAY_S = 2.0
+DEFAULT_VERIFY_RETRIES = 2
+
+# Protokol-trace (opt-in): maks. filstørrelse, antal roterede filer og skriveinterval
+DEFAULT_TRACE_MAX_BYTES = 2_000_000
+DEFAULT_TRACE_BACKUPS = 3
+DEFAULT_TRACE_FLUSH_S = 2.0
+
+# Forsinkelse før sidst kendte niveauer skrives til disk (samler mange ændringer)
+DEFAULT_SNAPSHOT_DELAY_S = 30
+
+# Profilering (service): standard- og maks. varighed, samplinginterval for
+# event-loop-forsinkelse og antal funktioner i resultatet
+DEFAULT_PROFILE_S = 30
+MAX_PROFILE_S = 300
+DEFAULT_LOOP_LAG_INTERVAL_S = 0.05
+DEFAULT_PROFILE_TOP = 40
+
+# Søgning efter bokse på det lokale net: deadline pr. host, samtidige forsøg
+# og maks. antal adresser pr. net (større net afgrænses til /24 omkring HA)
+DEFAULT_DISCOVERY_TIMEOUT_S = 1.5
+DEFAULT_DISCOVERY_PARALLEL = 64
+DEFAULT_DISCOVERY_MAX_HOSTS = 1024
+
+# Overgange (transition): boksens egen Fade tager omtrent så lang tid, så
+# kortere overgange klares med én Fade og ramp-trin ligger mindst så tæt.
+# Ramper må tilsammen bruge denne andel af linkets rate
+DEFAULT_FADE_S = 2.0
+DEFAULT_RAMP_LINK_SHARE = 0.5
+
+# Efter en vellykket test i opsætnings-dialogen holdes sessionen og enhedslisten
+# varm så længe, så den første opsætning kan bruge dem i stedet for at starte forfra
+DEFAULT_HANDOFF_S = 60
+
+# Prioriteter i kommandokøen (lavest først)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
 BRIGHTNESS_SCALE = 100
 
 
-PLATFORMS = ["light", "switch"]
+PLATFORMS = ["light", "switch", "sensor"]
+
+# Dispatcher-signal (formatteres med entry_id) når en enhed har fået nyt navn
+SIGNAL_DEVICE_RENAMED = f"{DOMAIN}_device_renamed_{{}}"
 
 # keywords til "switch" hvis ikke mappet
 SWITCH_NAME_KEYWORDS = (
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .api import ZenseClient
+from .const import (
+    DEFAULT_POLL_TICK_S,
+    DEFAULT_SNAPSHOT_DELAY_S,
+    DEFAULT_VERIFY_DELAY_S,
+    DEFAULT_VERIFY_RETRIES,
+    DOMAIN,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+)
+from .scheduler import PollScheduler
+from .store import ZenseLevelSnapshot
 
 
 @dataclass(frozen=True)
@@ -23,19 +35,210 @@ class ZenseCoordinator(DataUpdateCoordinator[dict[int, Optional[int]]]):
         client: ZenseClient,
         devices: list[ZenseDevice],
         polling_seconds: int,
+        snapshot: Optional[ZenseLevelSnapshot] = None,
     ) -> None:
         self.client = client
         self.devices = devices
+        self._snapshot = snapshot
+        # gendannede enheder der endnu ikke er læst fra boksen
+        self._unverified: set[int] = set()
+        # polling_seconds er nu max-alder for en enhed; runderne kører oftere
+        self.tick_s = min(int(polling_seconds), DEFAULT_POLL_TICK_S)
+        self.scheduler = PollScheduler([d.did for d in devices], max_interval=polling_seconds)
+        self._device_listeners: dict[int, list[CALLBACK_TYPE]] = {}
+        self._verify: dict[int, asyncio.Task] = {}
+        self._unsub_availability = client.async_add_availability_listener(
+            self._handle_availability
+        )
         super().__init__(
             hass=hass,
             logger=client.logger,
             name="zensehome_old",
-            update_interval=timedelta(seconds=int(polling_seconds)),
+            update_interval=timedelta(seconds=self.tick_s),
+            # sweeps opdaterer data på stedet og giver besked pr. enhed
+            always_update=False,
         )
 
-    async def _async_update_data(self) -> dict[int, Optional[int]]:
+    @property
+    def _owner(self) -> Optional[str]:
+        # ejer i klientens fair kø (klienten kan være delt mellem entries)
+        return self.config_entry.entry_id if self.config_entry is not None else None
+
+    @callback
+    def async_restore(self, levels: dict[int, int]) -> None:
+        # sidst kendte niveauer; første sweep læser alle og retter kun forskellene
+        self.data = {d.did: levels.get(d.did) for d in self.devices}
+        self._unverified = set(self.data)
+
+    @callback
+    def _async_schedule_snapshot(self, levels: dict[int, Optional[int]]) -> None:
+        if self._snapshot is not None:
+            self._snapshot.async_schedule_save(lambda: dict(levels), DEFAULT_SNAPSHOT_DELAY_S)
+
+    @callback
+    def async_add_device_listener(self, did: int, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        listeners = self._device_listeners.setdefault(did, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            listeners.remove(update_callback)
+            if not listeners:
+                self._device_listeners.pop(did, None)
+
+        return remove_listener
+
+    @callback
+    def _handle_availability(self, available: bool) -> None:
+        # circuit breaker skiftede tilstand: alle entiteter skal skifte tilgængelighed
+        self.async_update_listeners()
+
+    async def async_shutdown(self) -> None:
+        for task in self._verify.values():
+            task.cancel()
+        self._verify.clear()
+        self._unsub_availability()
+        self._unsub_availability = lambda: None
+        await super().async_shutdown()
+        if self._snapshot is not None and self.data:
+            await self._snapshot.async_save(self.data)
+
+    @callback
+    def _async_notify_device(self, did: int) -> None:
+        for update_callback in list(self._device_listeners.get(did, ())):
+            update_callback()
+
+    def note_use(self, did: int) -> None:
+        self.scheduler.note_use(did)
+
+    @callback
+    def async_set_level(self, did: int, level: Optional[int]) -> bool:
+        # kun den berørte enhed får besked, og kun hvis værdien faktisk ændrede sig
+        if self.data is None:
+            self.data = {}
+        if did in self.data and self.data[did] == level:
+            return False
+        self.data[did] = level
+        self._async_notify_device(did)
+        self._async_schedule_snapshot(self.data)
+        return True
+
+    @callback
+    def async_set_levels(self, levels: dict[int, Optional[int]]) -> list[int]:
+        if self.data is None:
+            self.data = {}
+        changed = [did for did, lvl in levels.items() if did not in self.data or self.data[did] != lvl]
+        for did in changed:
+            self.data[did] = levels[did]
+        for did in changed:
+            self._async_notify_device(did)
+        if changed:
+            self._async_schedule_snapshot(self.data)
+        return changed
+
+    @callback
+    def async_cancel_verify(self, did: int) -> None:
+        task = self._verify.pop(did, None)
+        if task is not None:
+            task.cancel()
+
+    @callback
+    def async_schedule_verify(self, did: int) -> None:
+        # læs enheden igen kort efter en skrivning; en ny skrivning erstatter den
+        # ventende, så kun den sidste i en serie (fx slider-træk) kontrolleres
+        self.async_cancel_verify(did)
+        self._verify[did] = self.hass.async_create_background_task(
+            self._async_verify(did), f"{DOMAIN}_verify_{did}"
+        )
+
+    async def _async_verify(self, did: int) -> None:
         try:
+            delay = DEFAULT_VERIFY_DELAY_S
+            for attempt in range(DEFAULT_VERIFY_RETRIES + 1):
+                await asyncio.sleep(delay)
+                self.client.telemetry.incr("verify_reads")
+                lvl = await self.client.get_level(
+                    did, priority=PRIORITY_BACKGROUND, owner=self._owner
+                )
+                if lvl is None:
+                    # linket er nede; sweeps og breaker tager over
+                    return
+                self.scheduler.note_poll(did)
+                # forventet er det niveau HA viser nu (seneste skrivning)
+                level = (self.data or {}).get(did)
+                if lvl == level:
+                    return
+                delay *= 2
+            # boksen har fået sidste ord: kommandoen er tabt eller overhalet
+            self.client.telemetry.incr("verify_mismatches")
+            self.logger.debug("Zense %s reads %s after write of %s", did, lvl, level)
+            if self.async_set_level(did, lvl):
+                self.scheduler.note_change(did)
+        finally:
+            if self._verify.get(did) is asyncio.current_task():
+                del self._verify[did]
+
+    async def async_refresh_devices(
+        self, ids: list[int], priority: int = PRIORITY_INTERACTIVE
+    ) -> dict[int, Optional[int]]:
+        # målrettet læsning af udvalgte enheder uden en fuld sweep
+        known = {d.did for d in self.devices}
+        out: dict[int, Optional[int]] = {}
+        for did in ids:
+            if did not in known:
+                continue
+            lvl = out[did] = await self.client.get_level(did, priority=priority, owner=self._owner)
+            if lvl is None:
+                continue
+            self.scheduler.note_poll(did)
+            self._unverified.discard(did)
+            if self.async_set_level(did, lvl):
+                self.scheduler.note_change(did)
+        return out
+
+    @callback
+    def async_handle_push(self, did: int, level: int) -> None:
+        if self.data is None or did not in self.data:
+            return
+        self.scheduler.note_poll(did)
+        if self.async_set_level(did, level):
+            self.scheduler.note_change(did)
+
+    async def _async_update_data(self) -> dict[int, Optional[int]]:
+        if self.data is None:
             ids = [d.did for d in self.devices]
-            return await self.client.async_get_levels(self.hass, ids)
+        elif self._unverified:
+            ids = [d.did for d in self.devices if d.did in self._unverified]
+        else:
+            # linkets polling-andel deles mellem de entries der bruger samme boks
+            share = self.client.limiter.rate / max(1, len(self.client.owners))
+            ids = self.scheduler.due(self.tick_s, share)
+        if not self.client.available and not self.client.breaker.probe_due():
+            raise UpdateFailed("Zense controller unreachable")
+
+        first = self.data is None
+        data = {} if first else self.data
+        try:
+            # hvert svar lægges ind med det samme; en afbrudt sweep beholder
+            # de værdier den allerede har hentet
+            async for did, lvl in self.client.async_iter_levels(ids, owner=self._owner):
+                if lvl is None and not self.client.available:
+                    raise UpdateFailed("Zense controller unreachable")
+                self.scheduler.note_poll(did)
+                if did in self._unverified:
+                    # kun ét ekstra forsøg; derefter polles enheden som de andre
+                    # (inden for linkets andel). Et mislykket læs overskriver ikke
+                    # det gendannede niveau
+                    self._unverified.discard(did)
+                    if lvl is None:
+                        continue
+                if did in data and data[did] == lvl:
+                    continue
+                data[did] = lvl
+                if not first:
+                    self.scheduler.note_change(did)
+                    self._async_notify_device(did)
+                self._async_schedule_snapshot(data)
         except Exception as e:
             raise UpdateFailed(str(e)) from e
+        return data
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .api import ZenseClient
+from .const import CONF_CODE, CONF_HOST, DOMAIN
+from .coordinator import ZenseCoordinator
+from .profiler import DATA_PROFILE
+
+TO_REDACT = {CONF_CODE, CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    data = hass.data[DOMAIN][entry.entry_id]
+    client: ZenseClient = data["client"]
+    coordinator: ZenseCoordinator = data["coordinator"]
+
+    now = time.monotonic()
+    sched = coordinator.scheduler
+    levels = coordinator.data or {}
+    devices = [
+        {
+            "did": d.did,
+            "name": d.name,
+            "level": levels.get(d.did),
+            "poll_budget_s": round(sched.budget(d.did, now), 1),
+        }
+        for d in coordinator.devices
+    ]
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "link": {
+            "available": client.available,
+            "connected": client.connected,
+            "inflight": client.inflight,
+            "queued": client.queue_depth,
+            "limiter": client.limiter.state,
+            "breaker": client.breaker.as_dict(),
+        },
+        "telemetry": client.telemetry.as_dict(),
+        "polling": {
+            "tick_s": coordinator.tick_s,
+            "max_interval_s": sched.max_interval,
+            "min_interval_s": sched.min_interval,
+            "last_update_success": coordinator.last_update_success,
+        },
+        "devices": devices,
+        # seneste kørsel af zensehome_old.profile (fælles for alle opsætninger)
+        "profile": hass.data.get(DATA_PROFILE, {}).get("last"),
+    }
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+from typing import Iterable
+
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DEFAULT_DISCOVERY_MAX_HOSTS,
+    DEFAULT_DISCOVERY_PARALLEL,
+    DEFAULT_DISCOVERY_TIMEOUT_S,
+    DEFAULT_PORT,
+)
+from .protocol import FRAME_END, FrameParser, Request
+
+_LOGGER = logging.getLogger(__name__)
+
+# en boks svarer med én kort frame; mere uden ">>...<<" er en anden tjeneste
+_PROBE_MAX_BYTES = 512
+
+
+async def async_local_networks(
+    hass: HomeAssistant,
+) -> list[tuple[ipaddress.IPv4Address, ipaddress.IPv4Network]]:
+    """HA's egne IPv4-adresser og deres net (fra network-integrationen)."""
+    try:
+        from homeassistant.components import network
+
+        adapters = await network.async_get_adapters(hass)
+    except Exception:
+        _LOGGER.debug("Zense discovery: no network adapters", exc_info=True)
+        return []
+
+    nets: list[tuple[ipaddress.IPv4Address, ipaddress.IPv4Network]] = []
+    for adapter in adapters:
+        if not adapter.get("enabled"):
+            continue
+        for ip in adapter.get("ipv4", ()):
+            addr = ipaddress.IPv4Address(ip["address"])
+            if addr.is_loopback or addr.is_link_local:
+                continue
+            net = ipaddress.IPv4Network(f"{addr}/{ip['network_prefix']}", strict=False)
+            if net.num_addresses > DEFAULT_DISCOVERY_MAX_HOSTS:
+                # et stort net afsøges ikke helt; boksen står typisk tæt på HA
+                net = ipaddress.IPv4Network(f"{addr}/24", strict=False)
+            nets.append((addr, net))
+    return nets
+
+
+async def _probe(host: str, port: int) -> bool:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        # uskadelig forespørgsel uden login; svaret er enten enhedslisten eller
+        # en fejl, men altid i boksens >>...<< framing
+        writer.write(Request.get_devices().encode())
+        await writer.drain()
+        parser = FrameParser()
+        received = 0
+        while not len(parser):
+            chunk = await reader.read(_PROBE_MAX_BYTES)
+            received += len(chunk)
+            if not chunk or received > _PROBE_MAX_BYTES:
+                return False
+            parser.feed(chunk)
+        frame = bytes(parser.pop()).lstrip()
+        return frame.startswith(b">>") and frame.endswith(FRAME_END)
+    finally:
+        writer.close()
+
+
+async def async_probe_host(
+    host: str, port: int = DEFAULT_PORT, timeout: float = DEFAULT_DISCOVERY_TIMEOUT_S
+) -> bool:
+    try:
+        return await asyncio.wait_for(_probe(host, port), timeout=timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+
+async def async_discover(
+    hosts: Iterable[str],
+    port: int = DEFAULT_PORT,
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT_S,
+    parallel: int = DEFAULT_DISCOVERY_PARALLEL,
+) -> list[str]:
+    """Hosts der svarer som en Zense-boks, i adresseorden."""
+    sem = asyncio.Semaphore(parallel)
+
+    async def one(host: str) -> bool:
+        async with sem:
+            return await async_probe_host(host, port, timeout)
+
+    hosts = list(hosts)
+    found = await asyncio.gather(*(one(h) for h in hosts))
+    return [h for h, ok in zip(hosts, found) if ok]
+
+
+async def async_discover_controllers(hass: HomeAssistant, port: int = DEFAULT_PORT) -> list[str]:
+    nets = await async_local_networks(hass)
+    own = {addr for addr, _ in nets}
+    hosts: dict[str, None] = {}
+    for _, net in nets:
+        hosts.update(dict.fromkeys(str(a) for a in net.hosts() if a not in own))
+    if not hosts:
+        return []
+    _LOGGER.debug("Zense discovery: probing %d hosts on port %s", len(hosts), port)
+    return await async_discover(hosts, port)
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
-import asyncio
 from typing import Optional
 
-from homeassistant.components.light import ATTR_BRIGHTNESS, ColorMode, LightEntity
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_TRANSITION,
+    ColorMode,
+    LightEntity,
+    LightEntityFeature,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .api import ZenseClient
-from .const import DOMAIN, DEFAULT_DEBOUNCE_S, BRIGHTNESS_SCALE, SWITCH_NAME_KEYWORDS
+from .const import DOMAIN, SIGNAL_DEVICE_RENAMED, BRIGHTNESS_SCALE, SWITCH_NAME_KEYWORDS
 from .coordinator import ZenseCoordinator, ZenseDevice
 
 
@@ -55,6 +61,7 @@ async def async_setup_entry(
 class ZenseLight(CoordinatorEntity[ZenseCoordinator], LightEntity):
     _attr_color_mode = ColorMode.BRIGHTNESS
     _attr_supported_color_modes = {ColorMode.BRIGHTNESS}
+    _attr_supported_features = LightEntityFeature.TRANSITION
 
     def __init__(
         self,
@@ -77,9 +84,30 @@ class ZenseLight(CoordinatorEntity[ZenseCoordinator], LightEntity):
             "model": "TCP Controller",
         }
 
-        self._debounce_s = float(DEFAULT_DEBOUNCE_S)
-        self._pending_task: Optional[asyncio.Task] = None
-        self._pending_level: Optional[int] = None
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_device_listener(self.dev.did, self.async_write_ha_state)
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_DEVICE_RENAMED.format(self.entry.entry_id),
+                self._handle_device_renamed,
+            )
+        )
+
+    @callback
+    def _handle_device_renamed(self, did: int, name: str) -> None:
+        if did != self.dev.did:
+            return
+        self.dev = ZenseDevice(did=did, name=name)
+        self._attr_name = f"{name} (Zense)"
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        return super().available and self.client.available
 
     @property
     def is_on(self) -> bool:
@@ -93,50 +121,61 @@ class ZenseLight(CoordinatorEntity[ZenseCoordinator], LightEntity):
             return None
         return _raw_to_ha(lvl)
 
-    async def async_turn_off(self, **kwargs) -> None:
-        if self._pending_task:
-            self._pending_task.cancel()
-            self._pending_task = None
-            self._pending_level = None
+    @callback
+    def _async_start_transition(self, target: int, duration: float) -> None:
+        # HA viser målet med det samme; boksen læses først igen når overgangen er
+        # færdig, så en kontrol-læsning ikke ser et mellemtrin som en fejl
+        did = self.dev.did
+        start = (self.coordinator.data or {}).get(did) or 0
+        self.coordinator.async_cancel_verify(did)
+        self.coordinator.async_set_level(did, target)
+        task = self.client.start_transition(did, start, target, duration)
 
-        await self.client.set_off(self.dev.did)
+        def _done(t) -> None:
+            if not t.cancelled():
+                self.coordinator.async_schedule_verify(did)
 
-        data = dict(self.coordinator.data or {})
-        data[self.dev.did] = 0
-        self.coordinator.async_set_updated_data(data)
+        task.add_done_callback(_done)
+
+    async def async_turn_off(self, **kwargs) -> None:
+        self.coordinator.note_use(self.dev.did)
+        transition = kwargs.get(ATTR_TRANSITION)
+        if transition:
+            self._async_start_transition(0, transition)
+            return
+        self.coordinator.async_set_level(self.dev.did, 0)
+        await self.client.set_off(self.dev.did)
+        self.coordinator.async_schedule_verify(self.dev.did)
 
     async def async_turn_on(self, **kwargs) -> None:
+        self.coordinator.note_use(self.dev.did)
+        transition = kwargs.get(ATTR_TRANSITION)
+        if transition is not None:
+            if ATTR_BRIGHTNESS in kwargs:
+                raw = _ha_to_raw(int(kwargs[ATTR_BRIGHTNESS]))
+            else:
+                raw = BRIGHTNESS_SCALE
+            if transition > 0:
+                self._async_start_transition(raw, transition)
+                return
+            # transition 0: straks, uden boksens fade
+            self.coordinator.async_set_level(self.dev.did, raw)
+            await self.client.set_level(self.dev.did, raw)
+            self.coordinator.async_schedule_verify(self.dev.did)
+            return
         if ATTR_BRIGHTNESS not in kwargs:
+            self.coordinator.async_set_level(self.dev.did, BRIGHTNESS_SCALE)
             await self.client.set_on(self.dev.did)
-
-            data = dict(self.coordinator.data or {})
-            data[self.dev.did] = BRIGHTNESS_SCALE
-            self.coordinator.async_set_updated_data(data)
+            self.coordinator.async_schedule_verify(self.dev.did)
             return
 
+        # klienten samler hurtige ændringer (fx slider-træk) pr. enhed
         raw = _ha_to_raw(int(kwargs[ATTR_BRIGHTNESS]))
-        self._pending_level = raw
-        if self._pending_task and not self._pending_task.done():
-            return
-        self._pending_task = asyncio.create_task(self._debounced_send())
-
-    async def _debounced_send(self) -> None:
-        try:
-            await asyncio.sleep(self._debounce_s)
-            lvl = self._pending_level
-            self._pending_level = None
-            if lvl is None:
-                return
-
-            if lvl <= 0:
-                await self.client.set_off(self.dev.did)
-                new_val = 0
-            else:
-                await self.client.fade(self.dev.did, lvl)
-                new_val = lvl
-
-            data = dict(self.coordinator.data or {})
-            data[self.dev.did] = new_val
-            self.coordinator.async_set_updated_data(data)
-        except asyncio.CancelledError:
-            return
+        if raw <= 0:
+            self.coordinator.async_set_level(self.dev.did, 0)
+            await self.client.set_off(self.dev.did)
+            self.coordinator.async_schedule_verify(self.dev.did)
+        else:
+            self.coordinator.async_set_level(self.dev.did, raw)
+            await self.client.fade(self.dev.did, raw)
+            self.coordinator.async_schedule_verify(self.dev.did)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from .const import (
+    DEFAULT_RATE_BURST,
+    DEFAULT_RATE_INITIAL,
+    DEFAULT_RATE_MAX,
+    DEFAULT_RATE_MIN,
+)
+
+
+class AdaptiveRateLimiter:
+    """AIMD-styret token bucket.
+
+    Raten hæves lineært så længe svartiderne holder sig nær det observerede
+    minimum og halveres ved Timeout-svar eller tomme læsninger. Klart stigende
+    svartid giver en mild nedjustering før boksen begynder at svare Timeout.
+    Efter en nedjustering klatres der multiplikativt tilbage mod den sidste
+    rate der virkede, og først derefter lineært videre.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_INITIAL,
+        min_rate: float = DEFAULT_RATE_MIN,
+        max_rate: float = DEFAULT_RATE_MAX,
+        burst: float = DEFAULT_RATE_BURST,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+    ) -> None:
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.rate = max(self.min_rate, min(self.max_rate, float(rate)))
+        self.burst = float(burst)
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+        self.rate_good = self.rate
+        self.srtt: float | None = None
+        self.rtt_min: float | None = None
+        self.successes = 0
+        self.failures = 0
+        self.mode = "probe"
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self, reserve: float = 0.0) -> float:
+        # reserve: tokens der skal blive tilbage til andre (fx brugerkommandoer)
+        need = 1.0 + max(0.0, min(reserve, self.burst - 1.0))
+        waited = 0.0
+        self._refill()
+        while self._tokens < need:
+            wait = (need - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+            waited += wait
+            self._refill()
+        self._tokens -= 1.0
+        return waited
+
+    def refund(self) -> None:
+        # tokenet blev ikke brugt (kommandoen udløb mens den ventede)
+        self._tokens = min(self.burst, self._tokens + 1.0)
+
+    def on_success(self, rtt: float) -> None:
+        self.successes += 1
+        rtt = max(0.0, float(rtt))
+        self.srtt = rtt if self.srtt is None else 0.8 * self.srtt + 0.2 * rtt
+        if self.rtt_min is None or rtt < self.rtt_min:
+            self.rtt_min = rtt
+        else:
+            # lad minimum glide langsomt op, så et enkelt heldigt svar ikke låser det
+            self.rtt_min += (rtt - self.rtt_min) * 0.01
+
+        # beslutningen tages på den enkelte måling, så ét langsomt svar kun giver
+        # én nedjustering; tolerancen dækker jitter og den kø et begrænset antal
+        # in-flight kommandoer selv giver hos boksen
+        if rtt <= 1.5 * self.rtt_min + 0.025:
+            if self.rate < self.rate_good:
+                self.rate = min(self.rate_good, self.rate * 1.15)
+                self.mode = "recover"
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                self.rate_good = self.rate
+                self.mode = "increase"
+        elif rtt > 3.0 * self.rtt_min + 0.1:
+            self.rate = max(self.min_rate, self.rate * 0.9)
+            self.mode = "latency"
+        else:
+            self.mode = "hold"
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        # målet for genopretning: raten før fejlen, men ikke ukritisk efter gentagne fejl
+        self.rate_good = max(self.rate, self.rate_good * 0.9)
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._tokens = min(self._tokens, 0.0)
+        self.mode = "backoff"
+
+    @property
+    def state(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "mode": self.mode,
+            "rate_good": round(self.rate_good, 3),
+            "srtt_ms": None if self.srtt is None else round(self.srtt * 1000, 1),
+            "rtt_min_ms": None if self.rtt_min is None else round(self.rtt_min * 1000, 1),
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import os
+import pstats
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .api import ZenseClient
+from .const import DEFAULT_LOOP_LAG_INTERVAL_S, DEFAULT_PROFILE_TOP, DOMAIN
+from .registry import DATA_CLIENTS
+from .telemetry import LatencyHistogram
+
+# Seneste profil (til diagnostics) og om en optagelse kører; fælles for alle entries
+DATA_PROFILE = f"{DOMAIN}_profile"
+
+_PKG_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_SELF = os.path.basename(__file__)
+
+# selectorens ventetid: loopet har intet at lave, så den tæller ikke som belastning
+_IDLE_FUNCS = ("<method 'poll' of", "<method 'select' of", "<method 'control' of")
+
+
+class LoopLagMonitor:
+    """Måler hvor meget for sent event loopet vækker en fast sleep.
+
+    Målingerne deles efter om en klient havde kommandoer i kø eller i flight,
+    så forsinkelse omkring klientkald kan skilles fra resten af HA.
+    """
+
+    def __init__(
+        self,
+        clients: Callable[[], Iterable[ZenseClient]],
+        interval: float = DEFAULT_LOOP_LAG_INTERVAL_S,
+    ) -> None:
+        self._clients = clients
+        self.interval = interval
+        self.busy = LatencyHistogram()
+        self.idle = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def _client_busy(self) -> bool:
+        return any(c.inflight or c.queue_depth for c in self._clients())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            (self.busy if self._client_busy() else self.idle).observe(lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def async_stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def as_dict(self) -> dict:
+        return {
+            "interval_ms": round(self.interval * 1000, 1),
+            "client_busy": self.busy.as_dict(),
+            "client_idle": self.idle.as_dict(),
+        }
+
+
+def _summarize(stats: pstats.Stats, top: int) -> dict:
+    # kun funktioner fra integrationen (uden profileren selv); tider er tid på
+    # event loopet, så en coroutine tæller kun mens den kører, ikke mens den venter
+    busy_s = 0.0
+    ours: list[tuple[str, int, str, int, float, float]] = []
+    for (filename, lineno, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        if filename == "~" and func.startswith(_IDLE_FUNCS):
+            continue
+        busy_s += tottime
+        module = filename[len(_PKG_DIR):]
+        if filename.startswith(_PKG_DIR) and module != _SELF:
+            ours.append((module, lineno, func, ncalls, tottime, cumtime))
+
+    modules: dict[str, float] = {}
+    for module, _, _, _, tottime, _ in ours:
+        modules[module] = modules.get(module, 0.0) + tottime
+    own_s = sum(modules.values())
+
+    ours.sort(key=lambda f: f[4], reverse=True)
+    return {
+        "loop_busy_s": round(busy_s, 3),
+        "integration_s": round(own_s, 3),
+        "integration_share_pct": round(100.0 * own_s / busy_s, 2) if busy_s else None,
+        "modules_ms": {
+            m: round(t * 1000, 2) for m, t in sorted(modules.items(), key=lambda i: -i[1])
+        },
+        "functions": [
+            {
+                "function": f"{module}:{lineno}({func})",
+                "calls": ncalls,
+                "tottime_ms": round(tottime * 1000, 2),
+                "cumtime_ms": round(cumtime * 1000, 2),
+                "percall_us": round(tottime / ncalls * 1e6, 1) if ncalls else None,
+            }
+            for module, lineno, func, ncalls, tottime, cumtime in ours[:top]
+        ],
+    }
+
+
+async def async_capture_profile(
+    hass: HomeAssistant, seconds: float, top: int = DEFAULT_PROFILE_TOP
+) -> dict:
+    """Profilér event loopet i `seconds` og gem et udtræk for integrationen."""
+    state: dict = hass.data.setdefault(DATA_PROFILE, {})
+    if state.get("running"):
+        raise HomeAssistantError("A Zense profile is already running")
+
+    clients: Callable[[], Iterable[ZenseClient]] = lambda: list(
+        hass.data.get(DATA_CLIENTS, {}).values()
+    )
+    telemetry_before = {id(c): dict(c.telemetry.counters) for c in clients()}
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # fx hvis HA's egen profiler-integration kører samtidig
+        raise HomeAssistantError(f"Cannot start profiler: {e}") from e
+    state["running"] = True
+    lag = LoopLagMonitor(clients)
+    lag.start()
+    started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    t0 = time.monotonic()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        await lag.async_stop()
+        state["running"] = False
+
+    # hvad klienterne lavede imens, så profilen kan holdes op mod trafikken;
+    # klienter angives ved deres entries, ikke host (diagnostics er redigeret)
+    traffic = []
+    for c in clients():
+        before = telemetry_before.get(id(c), {})
+        traffic.append(
+            {
+                "shared_by": sorted(c.owners),
+                "counters": {
+                    k: v - before.get(k, 0)
+                    for k, v in c.telemetry.counters.items()
+                    if v != before.get(k, 0)
+                },
+            }
+        )
+
+    result = {
+        "started": started,
+        "duration_s": round(time.monotonic() - t0, 1),
+        "loop_lag": lag.as_dict(),
+        "traffic": traffic,
+        **_summarize(pstats.Stats(profiler), top),
+    }
+    state["last"] = result
+    return result
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .const import BRIGHTNESS_SCALE
+
+FRAME_END = b"<<"
+
+VERB_LOGIN = "Login"
+VERB_DEVICES = "Get Devices"
+VERB_NAME = "Get Name"
+VERB_GET = "Get"
+VERB_SET = "Set"
+VERB_FADE = "Fade"
+# kun set i uopfordrede statusframes
+VERB_LEVEL = "Level"
+VERB_STATUS = "Status"
+
+# længste først, så "Get Name" ikke læses som "Get"
+_VERBS = (VERB_DEVICES, VERB_NAME, VERB_LOGIN, VERB_STATUS, VERB_LEVEL, VERB_FADE, VERB_SET, VERB_GET)
+_PUSH_VERBS = (VERB_SET, VERB_FADE, VERB_LEVEL, VERB_STATUS)
+
+
+@dataclass(frozen=True)
+class Request:
+    verb: str
+    did: Optional[int] = None
+    arg: Optional[str] = None
+
+    def encode(self) -> bytes:
+        parts = [self.verb]
+        if self.did is not None:
+            parts.append(str(self.did))
+        if self.arg is not None:
+            parts.append(self.arg)
+        return f">>{' '.join(parts)}<<".encode()
+
+    @classmethod
+    def login(cls, code: int) -> Request:
+        return cls(VERB_LOGIN, arg=str(int(code)))
+
+    @classmethod
+    def get_devices(cls) -> Request:
+        return cls(VERB_DEVICES)
+
+    @classmethod
+    def get_name(cls, did: int) -> Request:
+        return cls(VERB_NAME, did=int(did))
+
+    @classmethod
+    def get_level(cls, did: int) -> Request:
+        return cls(VERB_GET, did=int(did))
+
+    @classmethod
+    def set_level(cls, did: int, level: int) -> Request:
+        return cls(VERB_SET, did=int(did), arg=str(_clamp(level)))
+
+    @classmethod
+    def fade(cls, did: int, level: int) -> Request:
+        return cls(VERB_FADE, did=int(did), arg=str(_clamp(level)))
+
+    @classmethod
+    def from_command(cls, cmd: str) -> Request:
+        verb, rest = _split_verb(_body(cmd))
+        if not verb:
+            return cls(rest)
+        head, _, tail = rest.partition(" ")
+        if verb != VERB_LOGIN and head.isdigit():
+            return cls(verb, did=int(head), arg=tail.strip() or None)
+        return cls(verb, arg=rest or None)
+
+
+@dataclass(frozen=True)
+class Reply:
+    verb: str
+    raw: str
+    did: Optional[int] = None
+    level: Optional[int] = None
+    name: Optional[str] = None
+    ids: tuple[int, ...] = field(default=())
+    ok: bool = False
+    timeout: bool = False
+
+    @property
+    def is_push(self) -> bool:
+        return self.verb in _PUSH_VERBS and self.did is not None and self.level is not None
+
+    def matches(self, req: Request) -> bool:
+        if not self.verb:
+            # ukendt svar (fx ">>Error<<") kan kun krediteres den ældste kommando
+            return True
+        if self.verb != req.verb:
+            return False
+        if self.did is not None and req.did is not None and self.did != req.did:
+            return False
+        return True
+
+
+def _clamp(level: int) -> int:
+    return max(0, min(BRIGHTNESS_SCALE, int(level)))
+
+
+def _body(frame: str) -> str:
+    body = frame.strip()
+    if body.startswith(">>"):
+        body = body[2:]
+    if body.endswith("<<"):
+        body = body[:-2]
+    return body.strip()
+
+
+def _split_verb(body: str) -> tuple[str, str]:
+    for verb in _VERBS:
+        if body == verb or body.startswith(verb + " "):
+            return verb, body[len(verb):].strip()
+    return "", body
+
+
+def decode_reply(frame: str) -> Reply:
+    verb, rest = _split_verb(_body(frame))
+    timeout = "Timeout" in frame
+
+    if verb == VERB_LOGIN:
+        return Reply(verb, frame, ok=rest == "Ok", timeout=timeout)
+
+    if verb == VERB_DEVICES:
+        ids = tuple(int(x.strip()) for x in rest.split(",") if x.strip().isdigit())
+        return Reply(verb, frame, ids=ids, ok=bool(ids), timeout=timeout)
+
+    if verb == VERB_NAME:
+        name = rest.strip().strip("'")
+        if not name or name.lower() == "timeout":
+            return Reply(verb, frame, timeout=timeout)
+        return Reply(verb, frame, name=name, ok=True, timeout=timeout)
+
+    nums = rest.split()
+    if verb and nums and all(n.isdigit() for n in nums):
+        if len(nums) >= 2:
+            return Reply(verb, frame, did=int(nums[0]), level=int(nums[1]), ok=True, timeout=timeout)
+        if verb == VERB_GET:
+            return Reply(verb, frame, level=int(nums[0]), ok=True, timeout=timeout)
+    return Reply(verb, frame, ok=verb in (VERB_SET, VERB_FADE) and not timeout, timeout=timeout)
+
+
+class FrameParser:
+    """Inkrementel parser for >>...<< frames på én forbindelse.
+
+    Færdige frames gives videre som memoryview-udsnit af den buffer de blev
+    modtaget i; kun en ufærdig rest kopieres til en ny buffer.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._scan = 0
+        self._frames: deque[memoryview] = deque()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def feed(self, data: bytes) -> int:
+        buf = self._buf
+        buf += data
+        ends: list[int] = []
+        pos = self._scan
+        while True:
+            idx = buf.find(FRAME_END, pos)
+            if idx < 0:
+                break
+            pos = idx + len(FRAME_END)
+            ends.append(pos)
+
+        if not ends:
+            # et enkelt '<' kan være første halvdel af terminatoren
+            self._scan = max(0, len(buf) - len(FRAME_END) + 1)
+            return 0
+
+        view = memoryview(buf)
+        start = 0
+        for end in ends:
+            self._frames.append(view[start:end])
+            start = end
+        # den eksporterede buffer må ikke ændres; resten flyttes til en ny
+        self._buf = bytearray(view[start:])
+        self._scan = 0
+        return len(ends)
+
+    def pop(self) -> Optional[memoryview]:
+        if not self._frames:
+            return None
+        return self._frames.popleft()
+
+    def reset(self) -> None:
+        self._buf = bytearray()
+        self._scan = 0
+        self._frames.clear()
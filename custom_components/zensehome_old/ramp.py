@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from .const import DEFAULT_FADE_S, DEFAULT_RAMP_LINK_SHARE
+
+# (enhed, niveau) -> om skrivningen lykkedes
+StepWriter = Callable[[int, int], Awaitable[bool]]
+
+
+class RampScheduler:
+    """Kører overgange (transition) som en række Fade-trin pr. enhed.
+
+    Afstanden mellem trin vælges løbende ud fra linkets aktuelle rate og antal
+    samtidige ramper, så ramper tilsammen højst bruger link_share af linket;
+    den er aldrig kortere end boksens egen fade, der glatter mellem trinene.
+    """
+
+    def __init__(
+        self,
+        write: StepWriter,
+        rate: Callable[[], float],
+        fade_s: float = DEFAULT_FADE_S,
+        link_share: float = DEFAULT_RAMP_LINK_SHARE,
+    ) -> None:
+        self._write = write
+        self._rate = rate
+        self.fade_s = float(fade_s)
+        self.link_share = float(link_share)
+        self._ramps: dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._ramps)
+
+    def interval(self) -> float:
+        per_ramp = self._rate() * self.link_share / max(1, len(self._ramps))
+        return max(self.fade_s, 1.0 / per_ramp if per_ramp > 0 else math.inf)
+
+    def active(self, did: int) -> bool:
+        return did in self._ramps
+
+    def start(self, did: int, start: int, target: int, duration: float) -> asyncio.Task:
+        # en ny rampe for samme enhed erstatter den gamle
+        prev = self._ramps.pop(did, None)
+        if prev is not None:
+            prev.cancel()
+        task = asyncio.create_task(self._run(did, start, target, duration, prev))
+        self._ramps[did] = task
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task) -> None:
+        for did, t in list(self._ramps.items()):
+            if t is task:
+                del self._ramps[did]
+
+    async def async_cancel(self, did: int) -> None:
+        # ventes færdig, så rampens igangværende trin ikke blandes med det nye
+        task = self._ramps.pop(did, None)
+        if task is None or task is asyncio.current_task():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def async_cancel_all(self) -> None:
+        for did in list(self._ramps):
+            await self.async_cancel(did)
+
+    async def _run(
+        self, did: int, start: int, target: int, duration: float, prev: Optional[asyncio.Task]
+    ) -> bool:
+        if prev is not None:
+            # den gamle rampes igangværende trin skal være afsluttet først
+            await asyncio.wait({prev})
+        t0 = time.monotonic()
+        end = t0 + duration
+        last: Optional[int] = None
+        while True:
+            interval = self.interval()
+            now = time.monotonic()
+            if end - now <= interval:
+                # sidste trin: boksens fade når målet omtrent ved slutningen
+                await asyncio.sleep(max(0.0, end - now - self.fade_s))
+                return await self._write(did, target)
+            # hvert trin sigter mod niveauet ved næste trin; boksen fader derhen
+            at = now + interval
+            level = round(start + (target - start) * (at - t0) / duration)
+            if level != last and level != target:
+                await self._write(did, level)
+                last = level
+            await asyncio.sleep(max(0.0, at - time.monotonic()))
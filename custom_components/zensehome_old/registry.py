@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .api import ZenseClient
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Én klient (forbindelse, login, rate limiter, kø) pr. fysisk boks
+DATA_CLIENTS = f"{DOMAIN}_clients"
+# Klienter uden ejere der holdes åbne lidt endnu (host:port -> annuller-timer)
+DATA_LINGER = f"{DOMAIN}_linger"
+
+
+def client_key(host: str, port: int) -> str:
+    return f"{host.strip().lower()}:{int(port)}"
+
+
+@callback
+def async_get_client(
+    hass: HomeAssistant, host: str, port: int, code: int, owner: str
+) -> ZenseClient:
+    """Delt klient for host:port; owner er entry_id eller flow_id."""
+    clients: dict[str, ZenseClient] = hass.data.setdefault(DATA_CLIENTS, {})
+    key = client_key(host, port)
+    cancel = hass.data.get(DATA_LINGER, {}).pop(key, None)
+    if cancel is not None:
+        # en varm klient fra fx opsætnings-dialogen overtages med session og det hele
+        cancel()
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = ZenseClient(host, port, code)
+    elif client.code != int(code):
+        # boksen har kun én login-kode; den første ejers session bruges
+        _LOGGER.warning(
+            "Zense %s is already in use with another login code; sharing its session", key
+        )
+    client.owners.add(owner)
+    return client
+
+
+@callback
+def async_peek_client(hass: HomeAssistant, host: str, port: int) -> Optional[ZenseClient]:
+    """Eksisterende klient for host:port, uden at blive ejer af den."""
+    return hass.data.get(DATA_CLIENTS, {}).get(client_key(host, port))
+
+
+async def _async_close(hass: HomeAssistant, client: ZenseClient) -> None:
+    clients: dict[str, ZenseClient] = hass.data.get(DATA_CLIENTS, {})
+    key = client_key(client.host, client.port)
+    if clients.get(key) is client:
+        del clients[key]
+    await client.async_shutdown()
+
+
+async def async_release_client(
+    hass: HomeAssistant, client: ZenseClient, owner: str, linger: float = 0.0
+) -> None:
+    """Slip klienten; den sidste ejer lukker den, evt. først efter linger sekunder."""
+    client.owners.discard(owner)
+    client.async_stop_keepalive(owner)
+    if client.owners:
+        return
+    if linger <= 0:
+        await _async_close(hass, client)
+        return
+
+    key = client_key(client.host, client.port)
+    lingering: dict = hass.data.setdefault(DATA_LINGER, {})
+
+    @callback
+    def _expire(_now: datetime) -> None:
+        lingering.pop(key, None)
+        if not client.owners:
+            hass.async_create_task(_async_close(hass, client))
+
+    old = lingering.pop(key, None)
+    if old is not None:
+        old()
+    lingering[key] = async_call_later(hass, linger, _expire)
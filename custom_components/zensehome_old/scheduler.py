@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from .const import DEFAULT_POLL_HALF_LIFE_S, DEFAULT_POLL_LINK_SHARE, DEFAULT_POLL_MIN_S
+
+
+@dataclass
+class _DeviceStats:
+    last_poll: float = 0.0
+    last_change: float = 0.0
+    uses: float = 0.0
+    uses_at: float = 0.0
+
+
+class PollScheduler:
+    """Vælger hvilke enheder der skal polles i en given runde.
+
+    Hver enhed har et staleness-budget mellem min_interval og max_interval.
+    Enheder der for nylig har ændret sig eller bruges meget får et kort budget,
+    mens budgettet fordobles for hver half_life der går uden ændringer.
+    """
+
+    def __init__(
+        self,
+        ids: Iterable[int],
+        max_interval: float,
+        min_interval: float = DEFAULT_POLL_MIN_S,
+        half_life: float = DEFAULT_POLL_HALF_LIFE_S,
+        link_share: float = DEFAULT_POLL_LINK_SHARE,
+    ) -> None:
+        self.max_interval = float(max_interval)
+        self.min_interval = min(float(min_interval), self.max_interval)
+        self.half_life = float(half_life)
+        self.link_share = float(link_share)
+        self._stats: dict[int, _DeviceStats] = {did: _DeviceStats() for did in ids}
+
+    def _get(self, did: int) -> Optional[_DeviceStats]:
+        return self._stats.get(did)
+
+    def note_poll(self, did: int, now: Optional[float] = None) -> None:
+        st = self._get(did)
+        if st is not None:
+            st.last_poll = time.monotonic() if now is None else now
+
+    def note_change(self, did: int, now: Optional[float] = None) -> None:
+        st = self._get(did)
+        if st is not None:
+            st.last_change = time.monotonic() if now is None else now
+
+    def note_use(self, did: int, now: Optional[float] = None) -> None:
+        st = self._get(did)
+        if st is None:
+            return
+        now = time.monotonic() if now is None else now
+        st.uses = self._decayed_uses(st, now) + 1.0
+        st.uses_at = now
+        st.last_change = now
+
+    def _decayed_uses(self, st: _DeviceStats, now: float) -> float:
+        if not st.uses:
+            return 0.0
+        return st.uses * math.pow(0.5, (now - st.uses_at) / (4 * self.half_life))
+
+    def budget(self, did: int, now: Optional[float] = None) -> float:
+        st = self._get(did)
+        if st is None:
+            return self.max_interval
+        now = time.monotonic() if now is None else now
+        if not st.last_change:
+            return self.max_interval
+        quiet = max(0.0, now - st.last_change)
+        b = self.min_interval * math.pow(2.0, quiet / self.half_life)
+        b /= 1.0 + self._decayed_uses(st, now)
+        return max(self.min_interval, min(self.max_interval, b))
+
+    def due(self, tick_s: float, rate: float, now: Optional[float] = None) -> list[int]:
+        now = time.monotonic() if now is None else now
+        overdue: list[tuple[float, int]] = []
+        for did, st in self._stats.items():
+            if not st.last_poll:
+                overdue.append((math.inf, did))
+                continue
+            ratio = (now - st.last_poll) / self.budget(did, now)
+            if ratio >= 1.0:
+                overdue.append((ratio, did))
+        overdue.sort(reverse=True)
+        # loft over andelen af linktid der må bruges på polling i denne runde
+        cap = max(1, int(self.link_share * tick_s * max(rate, 0.0)))
+        return [did for _, did in overdue[:cap]]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Callable, Optional
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .api import ZenseClient
+from .const import CONF_HOST, CONF_PORT, DOMAIN
+from .registry import client_key
+
+# Kun hukommelsesopslag; ingen trafik til boksen
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+ValueFn = Callable[[ZenseClient], Optional[float]]
+
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v * 1000, 1)
+
+
+def _counter(key: str) -> tuple[SensorEntityDescription, ValueFn]:
+    desc = SensorEntityDescription(
+        key=key,
+        name=key.replace("_", " ").capitalize(),
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    )
+    return desc, lambda c: c.telemetry.counters[key]
+
+
+SENSORS: tuple[tuple[SensorEntityDescription, ValueFn], ...] = (
+    _counter("commands_sent"),
+    _counter("retries"),
+    _counter("reconnects"),
+    _counter("timeout_replies"),
+    (
+        SensorEntityDescription(
+            key="rtt_p50",
+            name="Round trip p50",
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        lambda c: _ms(c.telemetry.rtt.percentile(0.5)),
+    ),
+    (
+        SensorEntityDescription(
+            key="rtt_p99",
+            name="Round trip p99",
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        lambda c: _ms(c.telemetry.rtt.percentile(0.99)),
+    ),
+    (
+        SensorEntityDescription(
+            key="limiter_wait",
+            name="Rate limiter wait",
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.SECONDS,
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        ),
+        lambda c: round(c.telemetry.limiter_wait_total_s, 2),
+    ),
+    (
+        SensorEntityDescription(
+            key="queue_depth",
+            name="Queue depth",
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        lambda c: c.queue_depth + c.inflight,
+    ),
+    (
+        SensorEntityDescription(
+            key="link_rate",
+            name="Link rate",
+            native_unit_of_measurement="cmd/s",
+            state_class=SensorStateClass.MEASUREMENT,
+        ),
+        lambda c: round(c.limiter.rate, 2),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    # telemetrien hører til linket, ikke opsætningen: deler flere opsætninger
+    # samme boks, har kun én af dem sensorerne (den samme ved hver genstart)
+    key = client_key(entry.data[CONF_HOST], entry.data[CONF_PORT])
+    sharing = [
+        e.entry_id
+        for e in hass.config_entries.async_entries(DOMAIN)
+        if not e.disabled_by and client_key(e.data[CONF_HOST], e.data[CONF_PORT]) == key
+    ]
+    if min(sharing, default=entry.entry_id) != entry.entry_id:
+        return
+    client: ZenseClient = hass.data[DOMAIN][entry.entry_id]["client"]
+    async_add_entities(ZenseTelemetrySensor(entry, client, desc, fn) for desc, fn in SENSORS)
+
+
+class ZenseTelemetrySensor(SensorEntity):
+    """Telemetri for linket til boksen; slået fra som standard."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        client: ZenseClient,
+        desc: SensorEntityDescription,
+        value_fn: ValueFn,
+    ) -> None:
+        self.entity_description = desc
+        self.client = client
+        self._value_fn = value_fn
+        self._attr_name = f"Zense {desc.name}"
+        self._attr_unique_id = f"{entry.entry_id}_telemetry_{desc.key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": "ZenseHome",
+            "manufacturer": "Zense",
+            "model": "TCP Controller",
+        }
+
+    @property
+    def native_value(self) -> Optional[float]:
+        return self._value_fn(self.client)
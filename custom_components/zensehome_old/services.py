@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .const import BRIGHTNESS_SCALE, DEFAULT_PROFILE_S, DOMAIN, MAX_PROFILE_S
+from .profiler import async_capture_profile
+
+SERVICE_APPLY_LEVELS = "apply_levels"
+SERVICE_REFRESH_DEVICES = "refresh_devices"
+SERVICE_PROFILE = "profile"
+
+ATTR_ENTRY_ID = "entry_id"
+ATTR_LEVELS = "levels"
+ATTR_DEVICES = "devices"
+ATTR_SECONDS = "seconds"
+
+APPLY_LEVELS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_LEVELS): {
+            vol.Coerce(int): vol.All(vol.Coerce(int), vol.Range(min=0, max=BRIGHTNESS_SCALE))
+        },
+        vol.Optional(ATTR_ENTRY_ID): cv.string,
+    }
+)
+
+REFRESH_DEVICES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICES): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+        vol.Optional(ATTR_ENTRY_ID): cv.string,
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SECONDS, default=DEFAULT_PROFILE_S): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=MAX_PROFILE_S)
+        ),
+    }
+)
+
+
+def _entries_for(hass: HomeAssistant, call: ServiceCall) -> dict[str, dict]:
+    entries: dict[str, dict] = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_ENTRY_ID)
+    if entry_id is None:
+        return entries
+    if entry_id not in entries:
+        raise HomeAssistantError(f"Unknown {DOMAIN} entry: {entry_id}")
+    return {entry_id: entries[entry_id]}
+
+
+async def _async_apply_levels(hass: HomeAssistant, call: ServiceCall) -> None:
+    levels: dict[int, int] = call.data[ATTR_LEVELS]
+    remaining = dict(levels)
+    for data in _entries_for(hass, call).values():
+        known = {d.did for d in data["devices"]}
+        batch = {did: lvl for did, lvl in remaining.items() if did in known}
+        if not batch:
+            continue
+        for did in batch:
+            remaining.pop(did)
+            data["coordinator"].note_use(did)
+        # én samlet opdatering af koordinatoren, derefter skrivningerne
+        data["coordinator"].async_set_levels(batch)
+        await data["client"].async_apply_levels(batch)
+        for did in batch:
+            data["coordinator"].async_schedule_verify(did)
+    if remaining:
+        raise HomeAssistantError(f"Unknown Zense device id(s): {sorted(remaining)}")
+
+
+async def _async_refresh_devices(hass: HomeAssistant, call: ServiceCall) -> None:
+    remaining = set(call.data[ATTR_DEVICES])
+    for data in _entries_for(hass, call).values():
+        known = {d.did for d in data["devices"]}
+        batch = [did for did in call.data[ATTR_DEVICES] if did in remaining and did in known]
+        if not batch:
+            continue
+        remaining.difference_update(batch)
+        await data["coordinator"].async_refresh_devices(batch)
+    if remaining:
+        raise HomeAssistantError(f"Unknown Zense device id(s): {sorted(remaining)}")
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    if hass.services.has_service(DOMAIN, SERVICE_APPLY_LEVELS):
+        return
+
+    async def apply_levels(call: ServiceCall) -> None:
+        await _async_apply_levels(hass, call)
+
+    async def refresh_devices(call: ServiceCall) -> None:
+        await _async_refresh_devices(hass, call)
+
+    async def profile(call: ServiceCall) -> ServiceResponse:
+        # resultatet gemmes også til diagnostics
+        result = await async_capture_profile(hass, call.data[ATTR_SECONDS])
+        return result if call.return_response else None
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_APPLY_LEVELS, apply_levels, schema=APPLY_LEVELS_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH_DEVICES, refresh_devices, schema=REFRESH_DEVICES_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    hass.services.async_remove(DOMAIN, SERVICE_APPLY_LEVELS)
+    hass.services.async_remove(DOMAIN, SERVICE_REFRESH_DEVICES)
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+
+
+class ZenseDeviceCache:
+    """Enhedsliste og navne fra sidste opsætning.
+
+    Cachen er kun bundet til boksens adresse. Om boksens enhedsliste har
+    ændret sig siden, opdages af genvalideringen i baggrunden efter opsætning.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, host: str, port: int) -> None:
+        self.host = host
+        self.port = int(port)
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.devices")
+
+    @property
+    def peer(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def async_load(self) -> Optional[dict[int, str]]:
+        data = await self._store.async_load()
+        if not isinstance(data, dict):
+            return None
+        try:
+            devices = {int(k): str(v) for k, v in (data.get("devices") or {}).items()}
+        except (TypeError, ValueError):
+            return None
+        # en cache fra en anden boks (ændret host/port) bruges ikke
+        if not devices or data.get("peer") != self.peer:
+            return None
+        return devices
+
+    async def async_save(self, devices: dict[int, str]) -> None:
+        await self._store.async_save(
+            {
+                "peer": self.peer,
+                "devices": {str(k): v for k, v in sorted(devices.items())},
+            }
+        )
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+
+class ZenseLevelSnapshot:
+    """Sidst kendte niveauer, så entiteter kan oprettes før første sweep."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.levels")
+
+    async def async_load(self) -> Optional[dict[int, int]]:
+        data = await self._store.async_load()
+        if not isinstance(data, dict):
+            return None
+        try:
+            levels = {int(k): int(v) for k, v in (data.get("levels") or {}).items()}
+        except (TypeError, ValueError):
+            return None
+        return levels or None
+
+    @staticmethod
+    def _payload(levels: dict[int, Optional[int]]) -> dict:
+        return {"levels": {str(k): v for k, v in sorted(levels.items()) if v is not None}}
+
+    def async_schedule_save(
+        self, levels_fn: Callable[[], dict[int, Optional[int]]], delay: float
+    ) -> None:
+        # Store samler gentagne kald til én skrivning og skriver ved nedlukning af HA
+        self._store.async_delay_save(lambda: self._payload(levels_fn()), delay)
+
+    async def async_save(self, levels: dict[int, Optional[int]]) -> None:
+        # ved unload/reload: en ventende forsinket skrivning ville ellers gå tabt
+        await self._store.async_save(self._payload(levels))
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
@@ -2,12 +2,13 @@ from __future__ import annotations
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .api import ZenseClient
-from .const import DOMAIN, SWITCH_NAME_KEYWORDS, BRIGHTNESS_SCALE
+from .const import DOMAIN, SIGNAL_DEVICE_RENAMED, SWITCH_NAME_KEYWORDS, BRIGHTNESS_SCALE
 from .coordinator import ZenseCoordinator, ZenseDevice
 
 
@@ -60,21 +61,44 @@ class ZenseSwitch(CoordinatorEntity[ZenseCoordinator], SwitchEntity):
             "model": "TCP Controller",
         }
 
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_device_listener(self.dev.did, self.async_write_ha_state)
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_DEVICE_RENAMED.format(self.entry.entry_id),
+                self._handle_device_renamed,
+            )
+        )
+
+    @callback
+    def _handle_device_renamed(self, did: int, name: str) -> None:
+        if did != self.dev.did:
+            return
+        self.dev = ZenseDevice(did=did, name=name)
+        self._attr_name = f"{name} (Zense)"
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        return super().available and self.client.available
+
     @property
     def is_on(self) -> bool:
         lvl = (self.coordinator.data or {}).get(self.dev.did)
         return bool(lvl and lvl > 0)
 
     async def async_turn_off(self, **kwargs) -> None:
+        self.coordinator.note_use(self.dev.did)
+        self.coordinator.async_set_level(self.dev.did, 0)
         await self.client.set_off(self.dev.did)
-
-        data = dict(self.coordinator.data or {})
-        data[self.dev.did] = 0
-        self.coordinator.async_set_updated_data(data)
+        self.coordinator.async_schedule_verify(self.dev.did)
 
     async def async_turn_on(self, **kwargs) -> None:
+        self.coordinator.note_use(self.dev.did)
+        self.coordinator.async_set_level(self.dev.did, BRIGHTNESS_SCALE)
         await self.client.set_on(self.dev.did)
-
-        data = dict(self.coordinator.data or {})
-        data[self.dev.did] = BRIGHTNESS_SCALE
-        self.coordinator.async_set_updated_data(data)
+        self.coordinator.async_schedule_verify(self.dev.did)
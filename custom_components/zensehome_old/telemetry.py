@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import bisect
+import time
+
+# Faste spandgrænser i sekunder (log-skala), så en måling kun er en bisect og en +1
+LATENCY_BOUNDS_S = (
+    0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0,
+)
+
+
+class LatencyHistogram:
+    """Histogram med faste spande; percentiler estimeres ud fra spandene."""
+
+    __slots__ = ("bounds", "buckets", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BOUNDS_S) -> None:
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float | None:
+        # øvre grænse for den spand percentilen falder i; sidste spand bruger max
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        def ms(v: float | None) -> float | None:
+            return None if v is None else round(v * 1000, 1)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(0.5)),
+            "p90_ms": ms(self.percentile(0.9)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+            "buckets": {
+                f"le_{int(b * 1000)}ms": n for b, n in zip(self.bounds, self.buckets)
+            }
+            | {"inf": self.buckets[-1]},
+        }
+
+
+class ClientTelemetry:
+    """Tællere og histogrammer for linket. Kun heltal og lister; intet I/O."""
+
+    COUNTERS = (
+        "commands_sent",
+        "replies",
+        "retries",
+        "reconnects",
+        "logins",
+        "login_failures",
+        "timeout_replies",
+        "replies_lost",
+        "link_timeouts",
+        "queue_timeouts",
+        "stale_frames",
+        "push_frames",
+        "coalesced_writes",
+        "verify_reads",
+        "verify_mismatches",
+    )
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.counters: dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+        self.rtt = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        self.limiter_wait = LatencyHistogram()
+        self.limiter_wait_total_s = 0.0
+        self.queue_depth = 0
+        self.queue_depth_max = 0
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def note_queue_depth(self, depth: int) -> None:
+        self.queue_depth = depth
+        if depth > self.queue_depth_max:
+            self.queue_depth_max = depth
+
+    def note_limiter_wait(self, waited: float) -> None:
+        self.limiter_wait.observe(waited)
+        self.limiter_wait_total_s += waited
+
+    def as_dict(self) -> dict:
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "counters": dict(self.counters),
+            "queue_depth": self.queue_depth,
+            "queue_depth_max": self.queue_depth_max,
+            "limiter_wait_total_s": round(self.limiter_wait_total_s, 3),
+            "rtt": self.rtt.as_dict(),
+            "queue_wait": self.queue_wait.as_dict(),
+            "limiter_wait": self.limiter_wait.as_dict(),
+        }
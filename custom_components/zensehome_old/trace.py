@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from .const import DEFAULT_TRACE_BACKUPS, DEFAULT_TRACE_FLUSH_S, DEFAULT_TRACE_MAX_BYTES
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+# Retninger i en trace-linje
+TRACE_SENT = ">"
+TRACE_RECEIVED = "<"
+TRACE_EVENT = "*"
+
+
+class TraceRecorder:
+    """Skriver rå frames med monotone tidsstempler til en append-only fil.
+
+    Format: en header-linje pr. fil og pr. optager (genstart, reload),
+        #zense-trace <version> <host:port> <wall-clock start>
+    efterfulgt af én linje pr. frame eller hændelse,
+        <ms siden start> <retning> <frame>
+    hvor retning er '>' (sendt), '<' (modtaget) eller '*' (connect/close/eof).
+    Tiden fortsætter på tværs af roterede filer, så de kan lægges sammen igen;
+    en ny optager starter forfra på 0 ms efter sin egen header.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        peer: str,
+        max_bytes: int = DEFAULT_TRACE_MAX_BYTES,
+        backups: int = DEFAULT_TRACE_BACKUPS,
+    ) -> None:
+        self.path = path
+        self.peer = peer
+        self.max_bytes = int(max_bytes)
+        self.backups = int(backups)
+        self._t0 = time.monotonic()
+        self._wall0 = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        self._lines: list[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._headed = False
+        self.dropped = 0
+
+    def record(self, direction: str, frame: str) -> None:
+        # kun en streng i en liste på event loopet; skrivningen sker i en executor
+        if len(self._lines) >= 10000:
+            self.dropped += 1
+            return
+        ms = (time.monotonic() - self._t0) * 1000.0
+        self._lines.append(f"{ms:.1f} {direction} {frame.strip()}\n")
+
+    def _header(self) -> str:
+        return f"#zense-trace {TRACE_VERSION} {self.peer} {self._wall0}\n"
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, lines: list[str]) -> None:
+        data = "".join(lines)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = -1
+        if size >= 0 and size + len(data) > self.max_bytes:
+            self._rotate()
+            size = -1
+        with open(self.path, "a", encoding="utf-8") as f:
+            # også når en tidligere optager har skrevet i samme fil
+            if size <= 0 or not self._headed:
+                f.write(self._header())
+                self._headed = True
+            f.write(data)
+
+    async def async_flush(self) -> None:
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+        except OSError as e:
+            _LOGGER.warning("Zense trace %s could not be written: %s", self.path, e)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(DEFAULT_TRACE_FLUSH_S)
+            await self.async_flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def async_stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.async_flush()
+
+
+def read_trace(paths: list[str]) -> list[tuple[float, str, str]]:
+    """Læs en eller flere (roterede) trace-filer, ældste først."""
+    events: list[tuple[float, str, str]] = []
+    # hver optager har sit eget ur fra 0; en ny header lægges efter den forrige
+    # sessions sidste hændelse, så sessionerne ikke flettes ved sorteringen
+    session: Optional[str] = None
+    offset = end = 0.0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#zense-trace"):
+                    if line.strip() != session:
+                        session = line.strip()
+                        offset = end
+                    continue
+                if not line.strip() or line.startswith("#"):
+                    continue
+                ms, _, rest = line.rstrip("\n").partition(" ")
+                direction, _, frame = rest.partition(" ")
+                try:
+                    t = offset + float(ms) / 1000.0
+                except ValueError:
+                    continue
+                end = max(end, t)
+                events.append((t, direction, frame))
+    events.sort(key=lambda e: e[0])
+    return events
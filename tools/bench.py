@@ -0,0 +1,208 @@
+"""Benchmark af ZenseClient mod den lokale mock-controller.
+
+Måler for hver enhedsmængde:
+  - kommandoer/sek samt p50/p99 latency for interaktive Get-kommandoer
+  - tid for en fuld level-sweep
+  - async_setup_entry-tid, kold (ingen cache) og varm (cache fra første opstart)
+
+Kræver et Home Assistant-udviklingsmiljø (pip install homeassistant).
+Kør fra repo-roden:  python tools/bench.py --sizes 10 100 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_controller import MockConfig, MockController  # noqa: E402
+
+from custom_components.zensehome_old.api import ZenseClient  # noqa: E402
+from custom_components.zensehome_old.const import DOMAIN  # noqa: E402
+
+
+class SetupFailed(RuntimeError):
+    """async_setup_entry nåede ikke LOADED; tiden ville ikke sige noget."""
+
+
+def _check_loaded(entry, phase: str) -> None:
+    from homeassistant.config_entries import ConfigEntryState
+
+    if entry.state is not ConfigEntryState.LOADED:
+        raise SetupFailed(f"{phase} setup ended in state {entry.state.value}")
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+async def async_start_hass(config_dir: str):
+    from homeassistant import config_entries, loader
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers import area_registry, device_registry, entity, entity_registry
+    from homeassistant.helpers import translation
+
+    link = os.path.join(config_dir, "custom_components")
+    if not os.path.exists(link):
+        os.symlink(os.path.join(ROOT, "custom_components"), link)
+
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    if hasattr(translation, "async_setup"):
+        translation.async_setup(hass)
+    entity.async_setup(hass)
+    await area_registry.async_load(hass)
+    await device_registry.async_load(hass)
+    await entity_registry.async_load(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await hass.async_start()
+    return hass
+
+
+async def async_timed_setup(hass, port: int, code: int):
+    from homeassistant import config_entries
+
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="bench",
+        data={"host": "127.0.0.1", "port": port, "code": code},
+        source="user",
+        options={},
+    )
+    t0 = time.perf_counter()
+    await hass.config_entries.async_add(entry)
+    elapsed = time.perf_counter() - t0
+    await hass.async_block_till_done()
+    return entry, elapsed
+
+
+async def bench_commands(client: ZenseClient, ids: list[int], total: int, workers: int) -> dict:
+    lat: list[float] = []
+    failures = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal failures
+        for i in counter:
+            did = ids[i % len(ids)]
+            t0 = time.perf_counter()
+            lvl = await client.get_level(did)
+            lat.append(time.perf_counter() - t0)
+            if lvl is None:
+                failures += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - t0
+    return {
+        "commands": total,
+        "failures": failures,
+        "cmd_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_pct(lat, 50) * 1000, 1),
+        "p99_ms": round(_pct(lat, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(lat) * 1000, 1) if lat else 0.0,
+    }
+
+
+async def bench_size(n: int, args: argparse.Namespace) -> dict:
+    mock = MockController(
+        MockConfig(devices=n, latency=args.latency, jitter=args.jitter, seed=args.seed)
+    )
+    await mock.start()
+    result: dict[str, Any] = {"devices": n}
+    try:
+        client = ZenseClient("127.0.0.1", mock.port, mock.config.code)
+        if args.max_rate:
+            client.limiter.max_rate = args.max_rate
+        try:
+            result.update(await bench_commands(client, mock.ids, args.commands, args.workers))
+            t0 = time.perf_counter()
+            await client.async_get_levels(None, mock.ids)
+            result["sweep_s"] = round(time.perf_counter() - t0, 3)
+            result["limiter"] = client.limiter.state
+        finally:
+            await client.async_shutdown()
+
+        if not args.skip_setup:
+            with tempfile.TemporaryDirectory() as config_dir:
+                hass = await async_start_hass(config_dir)
+                try:
+                    entry, cold = await async_timed_setup(hass, mock.port, mock.config.code)
+                    _check_loaded(entry, "cold")
+                    await hass.config_entries.async_unload(entry.entry_id)
+                    # anden opstart bruger enhedscachen fra den første
+                    t0 = time.perf_counter()
+                    await hass.config_entries.async_setup(entry.entry_id)
+                    warm = time.perf_counter() - t0
+                    await hass.async_block_till_done()
+                    _check_loaded(entry, "cached")
+                    await hass.config_entries.async_unload(entry.entry_id)
+                    result["setup_cold_s"] = round(cold, 3)
+                    result["setup_cached_s"] = round(warm, 3)
+                finally:
+                    await hass.async_stop(force=True)
+        result["mock_frames"] = mock.stats.frames
+    finally:
+        await mock.stop()
+    return result
+
+
+def _print_table(rows: list[dict]) -> None:
+    cols = [
+        "devices",
+        "cmd_per_s",
+        "p50_ms",
+        "p99_ms",
+        "sweep_s",
+        "setup_cold_s",
+        "setup_cached_s",
+        "failures",
+    ]
+    print("  ".join(f"{c:>14}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{str(r.get(c, '-')):>14}" for c in cols))
+
+
+async def _main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    p.add_argument("--commands", type=int, default=200)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--latency", type=float, default=0.02)
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--max-rate", type=float, default=None, help="hæv limiterens loft")
+    p.add_argument("--skip-setup", action="store_true", help="spring async_setup_entry over")
+    p.add_argument("--json", action="store_true")
+    args = p.parse_args()
+
+    try:
+        rows = [await bench_size(n, args) for n in args.sizes]
+    except SetupFailed as e:
+        print(f"setup failed: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,199 @@
+"""Lokal stand-in for en ZenseHome PC-boks (TCP/ASCII, >>...<< frames).
+
+Bruges af benchmark- og soak-værktøjerne i denne mappe. Kan også startes
+direkte:  python tools/mock_controller.py --devices 100 --latency 0.05
+
+Fejl kan injiceres via FaultConfig (tabte forbindelser, Timeout-svar,
+delte frames, langsomme og manglende svar).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class MockConfig:
+    devices: int = 10
+    latency: float = 0.02
+    jitter: float = 0.01
+    code: int = 1234
+    first_id: int = 10000
+    seed: Optional[int] = 1
+
+
+@dataclass
+class FaultConfig:
+    # sandsynlighed pr. modtaget kommando
+    drop: float = 0.0
+    timeout: float = 0.0
+    split: float = 0.0
+    slow: float = 0.0
+    silent: float = 0.0
+    slow_s: float = 1.0
+
+    @property
+    def active(self) -> bool:
+        return any((self.drop, self.timeout, self.split, self.slow, self.silent))
+
+
+@dataclass
+class MockStats:
+    connections: int = 0
+    frames: int = 0
+    logins: int = 0
+    by_verb: dict[str, int] = field(default_factory=dict)
+    faults: dict[str, int] = field(default_factory=dict)
+
+
+class MockController:
+    def __init__(self, config: Optional[MockConfig] = None) -> None:
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.ids = [self.config.first_id + i for i in range(self.config.devices)]
+        self.levels = {did: 0 for did in self.ids}
+        self.names = {did: f"Enhed {did}" for did in self.ids}
+        self.stats = MockStats()
+        self.faults = FaultConfig()
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for w in list(self._writers):
+                w.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def drop_connections(self) -> None:
+        for w in list(self._writers):
+            w.close()
+
+    async def _delay(self) -> None:
+        d = self.config.latency + self.rng.uniform(-self.config.jitter, self.config.jitter)
+        if d > 0:
+            await asyncio.sleep(d)
+
+    def respond(self, body: str, logged_in: bool) -> tuple[str, bool]:
+        verb, _, rest = body.partition(" ")
+        if verb == "Login":
+            ok = rest.strip() == str(self.config.code)
+            if ok:
+                self.stats.logins += 1
+            return (">>Login Ok<<" if ok else ">>Login Failed<<"), ok
+        if not logged_in:
+            return ">>Not logged in<<", False
+        if body == "Get Devices":
+            return ">>Get Devices " + ",".join(str(d) for d in self.ids) + "<<", True
+        if body.startswith("Get Name "):
+            did = int(body[9:])
+            return f">>Get Name '{self.names.get(did, 'Timeout')}'<<", True
+        if verb == "Get":
+            did = int(rest)
+            if did not in self.levels:
+                return ">>Get Timeout<<", True
+            return f">>Get {self.levels[did]}<<", True
+        if verb in ("Set", "Fade"):
+            did_s, _, lvl_s = rest.partition(" ")
+            did = int(did_s)
+            if did not in self.levels:
+                return f">>{verb} Timeout<<", True
+            self.levels[did] = max(0, min(100, int(lvl_s)))
+            return f">>{verb} Ok<<", True
+        return ">>Error<<", True
+
+    def _fault(self, kind: str) -> bool:
+        rate = getattr(self.faults, kind)
+        if rate and self.rng.random() < rate:
+            self.stats.faults[kind] = self.stats.faults.get(kind, 0) + 1
+            return True
+        return False
+
+    async def _reply(self, writer: asyncio.StreamWriter, body: str, logged_in: bool) -> bool:
+        await self._delay()
+        login = body.startswith("Login")
+        if not login and self._fault("drop"):
+            writer.close()
+            raise ConnectionResetError("fault: drop")
+        if not login and self._fault("silent"):
+            return logged_in
+        if self._fault("slow"):
+            await asyncio.sleep(self.faults.slow_s)
+        if not login and self._fault("timeout"):
+            if body.startswith(("Get Name", "Get Devices")):
+                verb = " ".join(body.split(" ", 2)[:2])
+            else:
+                verb = body.split(" ", 1)[0]
+            out = f">>{verb} Timeout<<"
+        else:
+            out, logged_in = self.respond(body, logged_in)
+        data = out.encode()
+        if len(data) > 2 and self._fault("split"):
+            cut = self.rng.randint(1, len(data) - 1)
+            writer.write(data[:cut])
+            await writer.drain()
+            await asyncio.sleep(0.01)
+            data = data[cut:]
+        writer.write(data)
+        await writer.drain()
+        return logged_in
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        self._writers.add(writer)
+        buf = b""
+        logged_in = False
+        try:
+            while True:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    break
+                buf += chunk
+                while b"<<" in buf:
+                    idx = buf.index(b"<<")
+                    frame, buf = buf[: idx + 2], buf[idx + 2 :]
+                    body = frame.decode(errors="replace").strip()[2:-2].strip()
+                    self.stats.frames += 1
+                    verb = body.split(" ", 1)[0]
+                    self.stats.by_verb[verb] = self.stats.by_verb.get(verb, 0) + 1
+                    # boksen behandler én kommando ad gangen
+                    logged_in = await self._reply(writer, body, logged_in)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def _main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=10001)
+    p.add_argument("--devices", type=int, default=10)
+    p.add_argument("--latency", type=float, default=0.02)
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--code", type=int, default=1234)
+    a = p.parse_args()
+    mock = MockController(MockConfig(a.devices, a.latency, a.jitter, a.code))
+    await mock.start(a.host, a.port)
+    print(f"Mock ZenseHome on {a.host}:{mock.port} with {a.devices} devices (code {a.code})")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,300 @@
+"""Afspil en protokol-trace gennem ZenseClient mod en scriptet mock-controller.
+
+Traces optages med indstillingen "Optag protokol-trace" og ligger i HA's
+config-mappe (zensehome_old_trace_<host>_<port>.log, roterede som .1, .2 ...).
+
+Kommandoerne i tracen sendes igen på deres oprindelige tidspunkter, og mocken
+svarer med de optagne svar efter boksens optagne behandlingstid. --speed
+komprimerer kun stille perioder (pauser over --idle sekunder); bursts afspilles
+i deres oprindelige tempo. Afsendelsestiderne i tracen er allerede begrænset af
+klientens rate limiter, så --speed over 1 er en stresstest, ikke en gengivelse.
+Svar der aldrig kom, forbliver tavse, og forbindelser boksen lukkede, lukkes
+igen. Skrivninger (Set/Fade) sendes som brugerkommandoer, læsninger som
+baggrundsarbejde, som integrationen selv gør.
+
+  python tools/replay.py trace.log.2 trace.log.1 trace.log --speed 10
+  python tools/replay.py trace.log --speed 10 --json > baseline.json
+  python tools/replay.py trace.log --speed 10 --baseline baseline.json
+
+Med --baseline fejler kørslen (exit 1) hvis p99-latency for et verbum eller
+throughput er blevet mere end --tolerance dårligere.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_controller import MockConfig, MockController  # noqa: E402
+
+from custom_components.zensehome_old.api import ZenseClient  # noqa: E402
+from custom_components.zensehome_old.const import (  # noqa: E402
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+)
+from custom_components.zensehome_old.protocol import (  # noqa: E402
+    VERB_FADE,
+    VERB_LOGIN,
+    VERB_SET,
+    Request,
+    decode_reply,
+)
+from custom_components.zensehome_old.trace import (  # noqa: E402
+    TRACE_EVENT,
+    TRACE_RECEIVED,
+    TRACE_SENT,
+    read_trace,
+)
+
+
+@dataclass
+class Scripted:
+    reply: Optional[str]   # None: boksen svarede aldrig
+    service_s: float
+    drop: bool = False     # boksen lukkede forbindelsen efter kommandoen
+
+
+@dataclass
+class Script:
+    commands: list[tuple[float, Request]] = field(default_factory=list)
+    replies: dict[str, deque[Scripted]] = field(default_factory=dict)
+    recorded_rtt: dict[str, list[float]] = field(default_factory=dict)
+
+
+def _body(frame: str) -> str:
+    return frame.strip()[2:-2].strip()
+
+
+def build_script(events: list[tuple[float, str, str]]) -> Script:
+    script = Script()
+    pending: list[tuple[float, Request, str]] = []
+    # boksen behandler én kommando ad gangen: dens egen tid for en kommando
+    # regnes fra det seneste af afsendelse og forrige svar på forbindelsen
+    busy_until = 0.0
+    # en trace kan starte midt i en session (optagelse slået til undervejs)
+    connected = True
+
+    def settle(entry: tuple[float, Request, str], item: Scripted) -> None:
+        script.replies.setdefault(entry[2], deque()).append(item)
+
+    for t, direction, frame in events:
+        if direction == TRACE_SENT:
+            body = _body(frame)
+            req = Request.from_command(frame)
+            if req.verb == VERB_LOGIN or not connected:
+                # frames skrevet til en lukket forbindelse nåede aldrig boksen
+                continue
+            script.commands.append((t, req))
+            pending.append((t, req, body))
+        elif direction == TRACE_RECEIVED:
+            reply = decode_reply(frame)
+            idx = next((i for i, p in enumerate(pending) if reply.matches(p[1])), None)
+            if idx is None:
+                continue
+            # kommandoer foran det matchende svar fik aldrig deres svar
+            for lost in pending[:idx]:
+                settle(lost, Scripted(None, 0.0))
+            sent_t, req, body = pending[idx]
+            del pending[: idx + 1]
+            service = max(0.0, t - max(sent_t, busy_until))
+            busy_until = t
+            settle((sent_t, req, body), Scripted(frame.strip(), service))
+            script.recorded_rtt.setdefault(req.verb, []).append(t - sent_t)
+        elif direction == TRACE_EVENT and frame == "connect":
+            connected = True
+        elif direction == TRACE_EVENT and frame in ("eof", "close"):
+            connected = False
+            for i, p in enumerate(pending):
+                # ved eof var det boksen der lukkede efter den første ubesvarede
+                settle(p, Scripted(None, 0.0, drop=frame == "eof" and i == 0))
+            pending.clear()
+            busy_until = 0.0
+    for p in pending:
+        settle(p, Scripted(None, 0.0))
+    return script
+
+
+class ScriptedController(MockController):
+    """Mock der svarer med de optagne svar i stedet for sin egen model."""
+
+    def __init__(self, script: Script, latency_scale: float = 1.0) -> None:
+        super().__init__(MockConfig(devices=0, latency=0.0, jitter=0.0))
+        self.script = script
+        self.latency_scale = latency_scale
+        self.unscripted = 0
+
+    async def _reply(self, writer: asyncio.StreamWriter, body: str, logged_in: bool) -> bool:
+        if body.startswith(VERB_LOGIN):
+            out, logged_in = self.respond(body, logged_in)
+            writer.write(out.encode())
+            await writer.drain()
+            return logged_in
+        queue = self.script.replies.get(body)
+        if not queue:
+            # kommandoen er ikke i tracen (fx et ekstra genforsøg): svar Timeout
+            self.unscripted += 1
+            writer.write(f">>{body.split(' ', 1)[0]} Timeout<<".encode())
+            await writer.drain()
+            return logged_in
+        item = queue.popleft()
+        if item.service_s:
+            await asyncio.sleep(item.service_s * self.latency_scale)
+        if item.drop:
+            writer.close()
+            raise ConnectionResetError("replay: box closed connection")
+        if item.reply is not None:
+            writer.write(item.reply.encode())
+            await writer.drain()
+        return logged_in
+
+
+def _pct(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v * 1000, 1)
+
+
+def schedule(commands: list[tuple[float, Request]], speed: float, idle: float) -> list[float]:
+    # afspilningstidspunkter: pauser ud over idle deles med speed
+    out: list[float] = []
+    prev = commands[0][0] if commands else 0.0
+    at = 0.0
+    for t, _ in commands:
+        gap = t - prev
+        if gap > idle:
+            gap = idle + (gap - idle) / speed
+        at += gap
+        out.append(at)
+        prev = t
+    return out
+
+
+async def replay(
+    script: Script, speed: float, idle: float, latency_scale: float, timeout: float
+) -> dict:
+    mock = ScriptedController(script, latency_scale)
+    await mock.start()
+    client = ZenseClient("127.0.0.1", mock.port, mock.config.code)
+    client._timeout_s = timeout
+    results: dict[str, list[tuple[bool, float]]] = {}
+
+    async def issue(req: Request) -> None:
+        prio = PRIORITY_INTERACTIVE if req.verb in (VERB_SET, VERB_FADE) else PRIORITY_BACKGROUND
+        start = time.monotonic()
+        # genforsøg ligger allerede i tracen som egne kommandoer
+        reply = await client.request(req, priority=prio, retry=0)
+        results.setdefault(req.verb, []).append((reply is not None, time.monotonic() - start))
+
+    tasks = []
+    t0 = time.monotonic()
+    try:
+        for at, (_, req) in zip(schedule(script.commands, speed, idle), script.commands):
+            delay = at - (time.monotonic() - t0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(issue(req)))
+        await asyncio.gather(*tasks)
+        wall = time.monotonic() - t0
+    finally:
+        await client.async_shutdown()
+        await mock.stop()
+
+    ok = sum(1 for rs in results.values() for good, _ in rs if good)
+    verbs = {}
+    for verb, rs in sorted(results.items()):
+        lat = [d for good, d in rs if good]
+        rec = script.recorded_rtt.get(verb, [])
+        verbs[verb] = {
+            "count": len(rs),
+            "ok": sum(1 for good, _ in rs if good),
+            "p50_ms": _ms(_pct(lat, 0.5)),
+            "p99_ms": _ms(_pct(lat, 0.99)),
+            "recorded_p50_ms": _ms(_pct(rec, 0.5)),
+            "recorded_p99_ms": _ms(_pct(rec, 0.99)),
+        }
+    return {
+        "commands": len(script.commands),
+        "ok": ok,
+        "wall_s": round(wall, 2),
+        "throughput_ok_s": round(ok / wall, 2) if wall > 0 else None,
+        "unscripted": mock.unscripted,
+        "verbs": verbs,
+        "client": client.telemetry.counters,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems = []
+    for verb, cur in result["verbs"].items():
+        old = baseline.get("verbs", {}).get(verb)
+        if not old or old.get("p99_ms") is None or cur["p99_ms"] is None:
+            continue
+        if cur["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            problems.append(f"{verb} p99 {old['p99_ms']} -> {cur['p99_ms']} ms")
+    old_tp, cur_tp = baseline.get("throughput_ok_s"), result["throughput_ok_s"]
+    if old_tp and cur_tp is not None and cur_tp < old_tp * (1 - tolerance):
+        problems.append(f"throughput {old_tp} -> {cur_tp} ok/s")
+    return problems
+
+
+def _main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument("traces", nargs="+", help="trace-filer, ældste først")
+    p.add_argument("--speed", type=float, default=1.0, help="komprimering af stille perioder")
+    p.add_argument("--idle", type=float, default=1.0, help="pauser længere end dette er stille")
+    p.add_argument(
+        "--latency-scale", type=float, default=1.0, help="skalering af boksens optagne svartid"
+    )
+    p.add_argument("--timeout", type=float, default=12.0, help="klientens svar-timeout")
+    p.add_argument("--baseline", help="JSON fra en tidligere kørsel at sammenligne med")
+    p.add_argument("--tolerance", type=float, default=0.2)
+    p.add_argument("--json", action="store_true")
+    args = p.parse_args()
+
+    script = build_script(read_trace(args.traces))
+    if not script.commands:
+        print("No commands in trace", file=sys.stderr)
+        return 1
+    result = asyncio.run(
+        replay(script, args.speed, args.idle, args.latency_scale, args.timeout)
+    )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"{result['ok']}/{result['commands']} ok in {result['wall_s']}s "
+            f"({result['throughput_ok_s']} ok/s), {result['unscripted']} unscripted"
+        )
+        print(f"{'verb':>6} {'count':>6} {'ok':>6} {'p50':>8} {'p99':>8} {'rec p50':>8} {'rec p99':>8}")
+        for verb, v in result["verbs"].items():
+            print(
+                f"{verb:>6} {v['count']:>6} {v['ok']:>6} {v['p50_ms']!s:>8} {v['p99_ms']!s:>8} "
+                f"{v['recorded_p50_ms']!s:>8} {v['recorded_p99_ms']!s:>8}"
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for line in problems:
+            print("REGRESSION", line)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -0,0 +1,208 @@
+"""Soak-test af ZenseClient under vedvarende samtidig belastning med fejlinjektion.
+
+Et antal simulerede entiteter kører tilfældige Set/Fade/Get mod mock-controlleren,
+mens fejl-bursts (tabte forbindelser, Timeout-svar, delte frames, langsomme og
+manglende svar) slås til og fra i cyklusser. Harnesset kontrollerer:
+  - ingen state-korruption: hvert læst niveau skal matche boksens faktiske niveau
+  - kommandokøen forbliver begrænset (aldrig flere ventende end der er kaldere)
+  - throughput kommer tilbage efter hver burst; recovery-tiden logges pr. cyklus
+    og trenden over hele kørslen rapporteres
+
+Kræver et Home Assistant-udviklingsmiljø (pip install homeassistant).
+Kør fra repo-roden:  python tools/soak.py --cycles 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_controller import FaultConfig, MockConfig, MockController  # noqa: E402
+
+from custom_components.zensehome_old.api import ZenseClient  # noqa: E402
+from custom_components.zensehome_old.const import DEFAULT_MAX_INFLIGHT  # noqa: E402
+
+
+@dataclass
+class SoakReport:
+    ops: int = 0
+    ok: int = 0
+    failed: int = 0
+    corruptions: list[str] = field(default_factory=list)
+    max_pending: int = 0
+    baseline_ops_s: float = 0.0
+    recovery_s: list[float] = field(default_factory=list)
+    recovery_trend_s_per_cycle: float = 0.0
+    faults: dict[str, int] = field(default_factory=dict)
+    reconnects: int = 0
+
+
+class Soak:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mock = MockController(
+            MockConfig(devices=args.devices, latency=args.latency, jitter=args.jitter, seed=args.seed)
+        )
+        self.report = SoakReport()
+        self._done_at: list[float] = []
+        self._stop = asyncio.Event()
+        self.client: ZenseClient | None = None
+
+    def _pending(self) -> int:
+        c = self.client
+        assert c is not None
+        # opgivne kald ligger i køen til writeren når dem; de tæller ikke med
+        queued = sum(1 for _, _, _, fut, *_ in c._queue._queue if not fut.done())
+        return queued + len(c._inflight)
+
+    async def _caller(self, owned: list[int]) -> None:
+        # hver kalder ejer sine enheder, så et læst niveau kan kontrolleres eksakt
+        c = self.client
+        assert c is not None
+        while not self._stop.is_set():
+            did = self.rng.choice(owned)
+            op = self.rng.random()
+            self.report.ops += 1
+            if op < 0.4:
+                lvl = await c.get_level(did)
+                ok = lvl is not None
+                if ok and lvl != self.mock.levels[did]:
+                    self.report.corruptions.append(
+                        f"Get {did}: client={lvl} box={self.mock.levels[did]}"
+                    )
+            elif op < 0.7:
+                target = self.rng.randint(1, 99)
+                ok = await c.fade(did, target)
+                if ok and self.mock.levels[did] != target:
+                    self.report.corruptions.append(
+                        f"Fade {did}: sent={target} box={self.mock.levels[did]}"
+                    )
+            else:
+                target = self.rng.choice((0, 100))
+                ok = await (c.set_on(did) if target else c.set_off(did))
+                if ok and self.mock.levels[did] != target:
+                    self.report.corruptions.append(
+                        f"Set {did}: sent={target} box={self.mock.levels[did]}"
+                    )
+            if ok:
+                self.report.ok += 1
+                self._done_at.append(time.monotonic())
+            else:
+                self.report.failed += 1
+            self.report.max_pending = max(self.report.max_pending, self._pending())
+            await asyncio.sleep(self.rng.uniform(0, self.args.think))
+
+    def _rate(self, window: float) -> float:
+        now = time.monotonic()
+        return sum(1 for t in self._done_at if t >= now - window) / window
+
+    async def _await_recovery(self, burst_end: float) -> float:
+        target = 0.8 * self.report.baseline_ops_s
+        while time.monotonic() - burst_end < self.args.calm:
+            await asyncio.sleep(0.25)
+            if time.monotonic() - burst_end >= self.args.window and self._rate(self.args.window) >= target:
+                return time.monotonic() - burst_end
+        return float("inf")
+
+    async def run(self) -> SoakReport:
+        a = self.args
+        await self.mock.start()
+        self.client = ZenseClient("127.0.0.1", self.mock.port, self.mock.config.code)
+        self.client._timeout_s = a.timeout
+        self.client.breaker.base_cooldown = a.cooldown
+        ids = list(self.mock.ids)
+        groups = [ids[i :: a.callers] for i in range(a.callers)]
+        callers = [asyncio.create_task(self._caller(g)) for g in groups if g]
+        faults = FaultConfig(
+            drop=a.drop, timeout=a.timeout_rate, split=a.split, slow=a.slow, silent=a.silent
+        )
+        try:
+            await asyncio.sleep(a.calm)
+            self.report.baseline_ops_s = self._rate(a.calm)
+            for cycle in range(a.cycles):
+                self.mock.faults = faults
+                await asyncio.sleep(a.burst)
+                self.mock.faults = FaultConfig()
+                rec = await self._await_recovery(time.monotonic())
+                self.report.recovery_s.append(round(rec, 2))
+                print(
+                    f"cycle {cycle + 1}/{a.cycles}: recovery {rec:.2f}s "
+                    f"ok={self.report.ok} failed={self.report.failed} "
+                    f"pending_max={self.report.max_pending} rate={self.client.limiter.rate:.2f} "
+                    f"breaker={self.client.breaker.state}/{self.client.breaker.trips}",
+                    flush=True,
+                )
+        finally:
+            self._stop.set()
+            for t in callers:
+                t.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await self.client.async_shutdown()
+            await self.mock.stop()
+
+        finite = [(i, r) for i, r in enumerate(self.report.recovery_s) if r != float("inf")]
+        if len(finite) >= 2:
+            n = len(finite)
+            mx = sum(i for i, _ in finite) / n
+            my = sum(r for _, r in finite) / n
+            den = sum((i - mx) ** 2 for i, _ in finite)
+            if den:
+                self.report.recovery_trend_s_per_cycle = round(
+                    sum((i - mx) * (r - my) for i, r in finite) / den, 4
+                )
+        self.report.faults = dict(self.mock.stats.faults)
+        self.report.reconnects = max(0, self.mock.stats.connections - 1)
+        return self.report
+
+
+def _main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument("--devices", type=int, default=40)
+    p.add_argument("--callers", type=int, default=16)
+    p.add_argument("--cycles", type=int, default=10)
+    p.add_argument("--calm", type=float, default=20.0, help="sekunder uden fejl pr. cyklus")
+    p.add_argument("--burst", type=float, default=10.0, help="sekunder med fejl pr. cyklus")
+    p.add_argument("--window", type=float, default=5.0, help="vindue for throughput-måling")
+    p.add_argument("--think", type=float, default=0.5, help="maks. pause mellem en kalders kald")
+    p.add_argument("--latency", type=float, default=0.02)
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--timeout", type=float, default=2.0, help="klientens svar-timeout")
+    p.add_argument("--cooldown", type=float, default=3.0, help="circuit breaker cooldown")
+    p.add_argument("--drop", type=float, default=0.02)
+    p.add_argument("--timeout-rate", type=float, default=0.1)
+    p.add_argument("--split", type=float, default=0.2)
+    p.add_argument("--slow", type=float, default=0.05)
+    p.add_argument("--silent", type=float, default=0.02)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true")
+    args = p.parse_args()
+
+    report = asyncio.run(Soak(args).run())
+    if args.json:
+        print(json.dumps(asdict(report), indent=2, default=str))
+    else:
+        for k, v in asdict(report).items():
+            if k == "corruptions":
+                v = len(v)
+            print(f"{k:>28}: {v}")
+
+    # hver kalder har højst ét kald i kø; in-flight kan overleve en kalder der har givet op
+    bounded = report.max_pending <= args.callers + DEFAULT_MAX_INFLIGHT
+    recovered = all(r != float("inf") for r in report.recovery_s)
+    if report.corruptions:
+        for line in report.corruptions[:20]:
+            print("CORRUPTION", line)
+    return 0 if (not report.corruptions and bounded and recovered) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main())